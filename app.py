@@ -1,16 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import math
 import os
 import pandas as pd
 import numpy as np
 from argparse import Namespace
 from models.LSTM import MyLSTM  # Import your LSTM model
+from models.telemetry import set_stage_timer
+from serving import EnsemblePredictor, NotReady, TieredPredictor, latest_window
+from instrumentation import CONTENT_TYPE, MODEL_CACHE, REGISTRY, REQUESTS, stage
+from dataset import available_coins, data_path
+import profiling
 
 app = Flask(__name__)
+# opt-in request profiling: PROFILE_SAMPLE_RATE, or the X-Profile header and /profiles routes once
+# PROFILE_ADMIN_TOKEN is set
+profiling.install(app)
+# the model wrappers time their scale stages into the same histogram
+set_stage_timer(stage)
 
 # Function to load and preprocess the dataset
 def load_data(coin, include_date_for_time_series=True):
     # Define the file path based on the selected coin
-    file_path = os.path.join("data_loader", f"combined_{coin}_Data.csv")
+    file_path = data_path(coin)
     
     # Load the dataset
     df = pd.read_csv(file_path)
@@ -63,8 +74,24 @@ model_args = Namespace(
     n_bootstrap_draws=100
 )
 
-# Initialize the LSTM model
-lstm_model = MyLSTM(model_args)
+# One LSTM per coin, trained and fine-tuned on newly arrived rows in the background;
+# an EWMA fallback answers (model_tier "fallback") until the LSTM is ready
+lstm_models = TieredPredictor(lambda coin: MyLSTM(Namespace(**vars(model_args), coin=coin)), look_back=5,
+                              model_name='lstm')
+
+# Backends blended by /predict/ensemble; a backend slower than its timeout is left out of the blend
+ENSEMBLE_MODELS = ['lstm', 'random_forest', 'xgboost', 'arima']
+ensemble = EnsemblePredictor(ENSEMBLE_MODELS, vars(model_args), timeout=2.0, fit_n_jobs=2)
+
+# Coins with a price history; anything else is rejected before it reaches a metric label
+KNOWN_COINS = set(available_coins())
+
+def reject_unknown_coin(endpoint, coin):
+    # counted under coin="unknown" so arbitrary request values can't grow the label set
+    REQUESTS.inc(endpoint=endpoint, coin='unknown', tier='rejected')
+    response = jsonify({'error': f"Unknown coin {coin!r}", 'coins': sorted(KNOWN_COINS)})
+    response.status_code = 400
+    return response
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -72,38 +99,71 @@ def predict():
     data = request.json
     coin = data.get('coin')
     time_period = data.get('time_period')
+    if coin not in KNOWN_COINS:
+        return reject_unknown_coin('predict', coin)
 
     # Load the dataset for the selected coin
-    df = load_data(coin, include_date_for_time_series=False)
-
-    # Prepare the data for LSTM/GRU models
-    data = prepare_data(df, look_back=5)
-    
-    # Use the entire dataset for training
-    train_data = data
-
-    # Convert to DataFrame before passing to the model
-    train_data_df = pd.DataFrame(train_data, columns=[f"feature_{i}" for i in range(train_data.shape[1] - 1)] + ['Price'])
-    
-    # Train the model on the selected coin's dataset
-    lstm_model.fit(train_data_df)
-
-    # Prepare the input for prediction: last `look_back` data
-    look_back = 5
-    last_window = df.iloc[-look_back:].values.flatten().tolist()
-
-    # Make prediction for the future time period (in minutes)
-    predicted_price = lstm_model.predict(np.array([last_window]))[0][0]
+    with stage('load_data', coin):
+        df = load_data(coin, include_date_for_time_series=False)
 
-    # Convert float32 to float for JSON serialization
-    predicted_price = float(predicted_price)
+    # Predict from the last `look_back` rows; training happens off the request path
+    result = lstm_models.predict(coin, df)
 
     # Return the prediction as a JSON response
-    return jsonify({
-        'coin': coin,
-        'time_period': time_period,
-        'predicted_price': predicted_price
-    })
+    with stage('serialize', coin):
+        response = jsonify({
+            'coin': coin,
+            'time_period': time_period,
+            'predicted_price': result['prediction'],
+            'model_tier': result['tier']
+        })
+    REQUESTS.inc(endpoint='predict', coin=coin, tier=result['tier'])
+    return response
+
+@app.route('/predict/ensemble', methods=['POST'])
+def predict_ensemble():
+    data = request.json
+    coin = data.get('coin')
+    time_period = data.get('time_period')
+    if coin not in KNOWN_COINS:
+        return reject_unknown_coin('predict_ensemble', coin)
+
+    with stage('load_data', coin):
+        df = load_data(coin, include_date_for_time_series=True)
+
+    # Fit the backends that are missing (or failed and past their retry backoff) in the background;
+    # backends are blended as they become ready
+    status = ensemble.status(coin)
+    MODEL_CACHE.inc(coin=coin, model='ensemble', result='hit' if status == 'ready' else 'miss')
+    ensemble.fit(coin, df)
+
+    window, next_date = latest_window(df, look_back=5)
+    try:
+        result = ensemble.predict(coin, window, next_date)
+    except NotReady as e:
+        status = ensemble.status(coin)
+        REQUESTS.inc(endpoint='predict_ensemble', coin=coin, tier=status)
+        response = jsonify({'coin': coin, 'time_period': time_period, 'status': status})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+        return response
+
+    with stage('serialize', coin):
+        response = jsonify({
+            'coin': coin,
+            'time_period': time_period,
+            'predicted_price': result['prediction'],
+            'model_predictions': result['predictions'],
+            'model_weights': result['weights'],
+            'dropped_models': result['dropped']
+        })
+    REQUESTS.inc(endpoint='predict_ensemble', coin=coin, tier='ensemble')
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape endpoint: per-stage latency histograms and request/cache counters
+    return Response(REGISTRY.expose(), content_type=CONTENT_TYPE)
 
 if __name__ == '__main__':
     # Running the app on host 0.0.0.0 to make it accessible from outside
@@ -0,0 +1,224 @@
+"""
+Walk-forward backtesting of the models/ wrappers.
+
+The windowed history of a coin is cut into folds: each fold trains on an
+expanding (or fixed-size sliding) block of past windows and predicts the next
+`step` windows, so the model is refit every `step` rows. Folds run in parallel
+worker processes that attach to the coin's windows in shared memory. Errors are
+collected into (n_folds, step) arrays and every metric is computed on those
+arrays at once, per model and per step since the last refit.
+
+Example:
+    python backtest.py --coin BTC --models random_forest xgboost --initial-train 1000 --step 30
+"""
+import argparse
+import json
+import os
+import time
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from dataset import DATA_DIR, load_data, prepare_data
+from serving import weights_from_backtest, weights_path
+from train_matrix import DEFAULT_MODEL_ARGS, attach_array, share_array, window_frame, worker_threads
+
+# models that forecast the steps following their training sample rather than predicting each row
+# from its own features; they also have to step through the embargo rows
+SEQUENTIAL_MODELS = {"arima", "sarimax"}
+
+
+def walk_forward_folds(n_rows, initial_train, step, window="expanding", train_size=None, horizon=1, embargo=None):
+    """
+    Compute the row ranges of every walk-forward fold.
+
+    The target of window row i lies `horizon` steps past its last input, so
+    the `horizon - 1` rows before a test block have targets the model could
+    not know yet when it predicts the block. They are left out of training
+    (the embargo) so no training target is dated after the first test input.
+
+    Args:
+        n_rows (int): Number of windowed rows.
+        initial_train (int): Training rows of the first fold.
+        step (int): Rows predicted per fold, i.e. refit every `step` rows.
+        window (str): "expanding" keeps all past rows, "sliding" keeps the last `train_size`.
+        train_size (int): Training rows of a sliding window. Defaults to `initial_train`.
+        horizon (int): Steps ahead of the window the targets are taken from.
+        embargo (int): Rows dropped between training and test. Defaults to `horizon - 1`.
+
+    Returns:
+        np.ndarray: (n_folds, 4) array of train_start, train_end, test_start, test_end.
+    """
+    if embargo is None:
+        embargo = horizon - 1
+    test_starts = np.arange(initial_train, n_rows, step)
+    test_ends = np.minimum(test_starts + step, n_rows)
+    train_ends = np.maximum(test_starts - embargo, 0)
+    if window == "sliding":
+        train_starts = np.maximum(train_ends - (train_size or initial_train), 0)
+    else:
+        train_starts = np.zeros_like(test_starts)
+    return np.column_stack([train_starts, train_ends, test_starts, test_ends])
+
+
+def _run_fold(model_name, model_args, fold, windows_spec, dates_spec):
+    windows_shm, windows = attach_array(windows_spec)
+    dates_shm, dates = attach_array(dates_spec)
+    try:
+        from models import MODELS
+
+        train_start, train_end, test_start, test_end = fold
+        # forecasts of sequential models start right after train_end; the embargo steps are dropped
+        predict_start = train_end if model_name in SEQUENTIAL_MODELS else test_start
+        train = window_frame(windows[train_start:train_end], dates[train_start:train_end], model_name)
+        test = window_frame(windows[predict_start:test_end], dates[predict_start:test_end], model_name)
+        model = MODELS[model_name](Namespace(**model_args))
+        model.fit(train)
+        predictions = model.predict(test.drop(columns=["Price"]))
+        return np.asarray(predictions, dtype=float).ravel()[test_start - predict_start:], None
+    except Exception as e:
+        return None, repr(e)
+    finally:
+        del windows, dates
+        windows_shm.close()
+        dates_shm.close()
+
+
+def compute_metrics(actual, predicted):
+    """
+    Vectorized error metrics over folds and steps.
+
+    Args:
+        actual (np.ndarray): (n_folds, step) actual prices, NaN-padded.
+        predicted (np.ndarray): (n_folds, step) predictions, NaN-padded.
+
+    Returns:
+        dict: Overall metrics, plus per-step metrics as arrays of length `step`.
+    """
+    errors = actual - predicted
+    abs_errors = np.abs(errors)
+    pct_errors = abs_errors / np.abs(actual)
+    return {
+        "mae": float(np.nanmean(abs_errors)),
+        "rmse": float(np.sqrt(np.nanmean(errors ** 2))),
+        "mape": float(np.nanmean(pct_errors) * 100),
+        "bias": float(np.nanmean(errors)),
+        "mae_by_step": np.nanmean(abs_errors, axis=0),
+        "rmse_by_step": np.sqrt(np.nanmean(errors ** 2, axis=0)),
+        "mape_by_step": np.nanmean(pct_errors, axis=0) * 100,
+        "mae_by_fold": np.nanmean(abs_errors, axis=1),
+    }
+
+
+def backtest(coin, model_names, look_back=5, horizon=1, initial_train=1000, step=30, window="expanding",
+             train_size=None, embargo=None, workers=None, threads_per_job=1, model_args_overrides=None,
+             data_dir=DATA_DIR, df=None):
+    """
+    Walk-forward backtest of several models on one coin.
+
+    Args:
+        coin (str): Coin symbol.
+        model_names (list): Keys of models.MODELS.
+        initial_train (int): Training rows of the first fold.
+        step (int): Rows predicted per fold (refit every `step` rows).
+        window (str): "expanding" or "sliding".
+        embargo (int): Rows left out before each test block; defaults to `horizon - 1`.
+        workers (int): Worker processes shared by all folds of all models.
+        df (pd.DataFrame): Already loaded price data; loaded from `data_dir` if None.
+
+    Returns:
+        dict: Model name to {"actual", "predicted", "folds", "metrics", "errors"}.
+    """
+    if df is None:
+        df = load_data(coin, include_date_for_time_series=True, data_dir=data_dir)
+    windows = prepare_data(df, look_back, horizon)
+    dates = df['Date'].to_numpy(dtype="datetime64[ns]")[look_back + horizon - 1:][:len(windows)].view("int64")
+    folds = walk_forward_folds(len(windows), initial_train, step, window, train_size, horizon, embargo)
+    if len(folds) == 0:
+        raise ValueError(f"Not enough rows for a backtest of {coin}: {len(windows)} <= {initial_train}")
+
+    model_args = dict(DEFAULT_MODEL_ARGS, coin=coin, n_jobs=threads_per_job)
+    model_args.update(model_args_overrides or {})
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_job)
+
+    # (n_folds, step) grid of the rows each fold predicts; cells past a fold's end are NaN
+    test_rows = folds[:, 2:3] + np.arange(step)[None, :]
+    valid = test_rows < folds[:, 3:4]
+    actual = np.where(valid, windows[np.minimum(test_rows, len(windows) - 1), -1], np.nan)
+
+    windows_shm, windows_spec = share_array(windows)
+    dates_shm, dates_spec = share_array(dates)
+    try:
+        with worker_threads(threads_per_job), \
+                ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = {name: [pool.submit(_run_fold, name, model_args, tuple(fold), windows_spec, dates_spec)
+                              for fold in folds]
+                       for name in model_names}
+            results = {}
+            for name, fold_futures in futures.items():
+                predicted = np.full(actual.shape, np.nan)
+                errors = []
+                for i, future in enumerate(fold_futures):
+                    values, error = future.result()
+                    if error is not None:
+                        errors.append((i, error))
+                        continue
+                    predicted[i, :len(values)] = values[:step]
+                results[name] = {"actual": actual, "predicted": predicted, "folds": folds,
+                                 "metrics": compute_metrics(actual, predicted), "errors": errors}
+    finally:
+        for shm in (windows_shm, dates_shm):
+            shm.close()
+            shm.unlink()
+    return results
+
+
+def summarize(results):
+    """
+    One row of overall metrics per model.
+    """
+    rows = []
+    for name, result in results.items():
+        metrics = result["metrics"]
+        rows.append({"model": name, "mae": metrics["mae"], "rmse": metrics["rmse"], "mape": metrics["mape"],
+                     "bias": metrics["bias"], "folds": len(result["folds"]),
+                     "failed_folds": len(result["errors"])})
+    return pd.DataFrame(rows).sort_values("rmse").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the models/ wrappers")
+    parser.add_argument("--coin", default="BTC")
+    parser.add_argument("--models", nargs="+", default=["random_forest", "xgboost", "arima"])
+    parser.add_argument("--look-back", type=int, default=5)
+    parser.add_argument("--horizon", type=int, default=1)
+    parser.add_argument("--embargo", type=int, default=None, help="Rows dropped before each test block")
+    parser.add_argument("--initial-train", type=int, default=1000)
+    parser.add_argument("--step", type=int, default=30)
+    parser.add_argument("--window", choices=["expanding", "sliding"], default="expanding")
+    parser.add_argument("--train-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-job", type=int, default=1)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output-dir", default="models")
+    cli = parser.parse_args()
+
+    start = time.perf_counter()
+    results = backtest(cli.coin, cli.models, cli.look_back, cli.horizon, initial_train=cli.initial_train,
+                       step=cli.step, window=cli.window, train_size=cli.train_size, embargo=cli.embargo,
+                       workers=cli.workers, threads_per_job=cli.threads_per_job, data_dir=cli.data_dir)
+    summary = summarize(results)
+    print(summary.to_string(index=False))
+    for name, result in results.items():
+        by_step = pd.DataFrame({key.replace("_by_step", ""): result["metrics"][key]
+                                for key in ("mae_by_step", "rmse_by_step", "mape_by_step")})
+        by_step.index.name = "steps_since_refit"
+        by_step.to_csv(os.path.join(cli.output_dir, f"{name}_{cli.coin}_Backtest.csv"))
+    # inverse-MSE blend weights read by serving.EnsemblePredictor
+    with open(weights_path(cli.coin, cli.output_dir), "w") as f:
+        json.dump(weights_from_backtest(results), f, indent=2)
+    print(f"Backtest finished in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the data and model hot paths (run.py) and the prediction API (loadtest.py).
+
+Run from the repository root, e.g. `python -m benchmarks.run --help`.
+"""
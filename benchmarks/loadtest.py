@@ -0,0 +1,271 @@
+"""
+Load test of the prediction API.
+
+`--concurrency` client threads each send requests back to back (a closed
+loop, like app users waiting for each answer) for `--duration` seconds. Each
+request picks an endpoint by weight and a coin and horizon (time_period) at
+random. Requests sent during the first `--warmup` seconds are not counted,
+so the first-use model fits can be kept out of the numbers.
+
+In a closed loop a slow server also slows the clients down, so fewer
+requests are sent exactly while latency is high and p99 understates what
+users arriving at a steady rate would see. `--rate` switches to an open loop:
+requests are scheduled at a fixed total rate, and latency is measured from
+each request's scheduled time, so time spent waiting for a free client
+thread counts. Give it enough `--concurrency` to keep up with the rate.
+
+The report gives throughput, goodput (successful requests per second),
+latency percentiles (p50/p95/p99) and error rate, overall and per endpoint.
+Pass `--output` to keep it as JSON and compare serving changes. A server
+started with `--start-server` writes its output to `--server-log`.
+
+Example:
+    # start app.py on a free local port, then drive it
+    python -m benchmarks.loadtest --start-server --concurrency 16 --duration 60 --warmup 10
+    # against an already running server, mostly /predict with some ensemble requests
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --endpoints predict=4 ensemble=1
+    # open loop at 50 requests/s
+    python -m benchmarks.loadtest --start-server --rate 50 --concurrency 64 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import requests
+
+# name -> (method, path); requests carry {"coin", "time_period"} as the app expects
+ENDPOINTS = {
+    "predict": ("POST", "/predict"),
+    "ensemble": ("POST", "/predict/ensemble"),
+}
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SERVER_LOG = os.path.join(".cache", "loadtest", "server.log")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port=None, cwd=REPO_ROOT, timeout=120.0, log_path=DEFAULT_SERVER_LOG):
+    """
+    Start app.py with Flask's threaded server (no debugger or reloader) and wait until it answers.
+
+    Args:
+        port (int): Port to listen on; a free one is picked if None.
+        cwd (str): Working directory of the server.
+        timeout (float): Seconds to wait for the server to come up.
+        log_path (str): File the server's stdout and stderr are written to.
+
+    Returns:
+        tuple: (subprocess.Popen, base URL).
+    """
+    port = port or _free_port()
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    with open(log_path, "wb") as log:
+        # the child keeps its own handle to the file
+        process = subprocess.Popen([sys.executable, "-m", "flask", "--app", "app", "run", "--host", "127.0.0.1",
+                                    "--port", str(port), "--no-reload", "--no-debugger", "--with-threads"],
+                                   cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before answering; see {log_path}")
+        try:
+            requests.get(f"{url}/metrics", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    process.terminate()
+    raise TimeoutError(f"Server did not answer on {url} within {timeout} s; see {log_path}")
+
+
+def _worker(url, plan, next_send, record, seed, timeout):
+    # next_send() returns when the next request is due (None once the run is over)
+    rng = random.Random(seed)
+    session = requests.Session()
+    names, weights = zip(*plan["endpoints"].items())
+    while True:
+        due = next_send()
+        if due is None:
+            return
+        name = rng.choices(names, weights)[0]
+        method, path = ENDPOINTS[name]
+        payload = {"coin": rng.choice(plan["coins"]), "time_period": rng.choice(plan["horizons"])}
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            response = session.request(method, url + path, json=payload, timeout=timeout)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        record(name, due, time.monotonic() - due, status)
+
+
+def run_load(url, endpoints, coins, horizons, concurrency=8, duration=30.0, warmup=0.0, timeout=30.0, seed=0,
+             rate=None):
+    """
+    Drive the API from `concurrency` threads and collect every request.
+
+    Args:
+        url (str): Base URL of the server.
+        endpoints (dict): Endpoint name (key of ENDPOINTS) to relative weight.
+        coins (list): Coins to request.
+        horizons (list): time_period values to request.
+        concurrency (int): Client threads.
+        duration (float): Measured seconds, after the warmup.
+        warmup (float): Seconds of load before measuring starts.
+        timeout (float): Per-request timeout in seconds.
+        seed (int): Random seed of the request mix.
+        rate (float): Total requests per second of an open loop; None runs a closed loop.
+
+    Returns:
+        dict: Report from summarize.
+    """
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints {sorted(unknown)}; choose from {sorted(ENDPOINTS)}")
+    plan = {"endpoints": endpoints, "coins": list(coins), "horizons": list(horizons)}
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    samples = []
+    lock = threading.Lock()
+    scheduled = iter(range(sys.maxsize))
+
+    def next_send():
+        if rate is None:
+            # closed loop: send as soon as the previous answer arrived
+            now = time.monotonic()
+            return now if now < deadline else None
+        with lock:
+            due = start + next(scheduled) / rate
+        return due if due < deadline else None
+
+    def record(name, sent, latency, status):
+        if sent >= measure_from:
+            with lock:
+                samples.append((name, latency, status))
+
+    threads = [threading.Thread(target=_worker, args=(url, plan, next_send, record, seed + i, timeout), daemon=True)
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # requests still in flight at the deadline finish after it; measure up to the last one
+    elapsed = max(time.monotonic() - measure_from, 1e-9)
+    report = summarize(samples, elapsed)
+    report["config"] = {"url": url, "concurrency": concurrency, "duration": duration, "warmup": warmup,
+                        "timeout": timeout, "seed": seed, "rate": rate, **plan}
+    return report
+
+
+def _latency_stats(latencies):
+    latencies = np.asarray(latencies, dtype=float) * 1000
+    if len(latencies) == 0:
+        return {name: None for name in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"mean_ms": float(latencies.mean()), "p50_ms": float(p50), "p95_ms": float(p95),
+            "p99_ms": float(p99), "max_ms": float(latencies.max())}
+
+
+def summarize(samples, elapsed):
+    """
+    Throughput, goodput, error rate and latency percentiles of (endpoint, seconds, status) samples.
+
+    Throughput counts every request, goodput only successful (HTTP 200) ones.
+    Latencies cover successful requests only; errors are counted by status.
+    """
+    def block(rows):
+        ok = [latency for _, latency, status in rows if status == "200"]
+        return {"requests": len(rows), "throughput_rps": len(rows) / elapsed, "goodput_rps": len(ok) / elapsed,
+                "error_rate": 1 - len(ok) / len(rows) if rows else 0.0,
+                "statuses": dict(Counter(status for _, _, status in rows)), **_latency_stats(ok)}
+
+    report = {"elapsed_seconds": elapsed, **block(samples), "endpoints": {}}
+    for name in sorted({name for name, _, _ in samples}):
+        report["endpoints"][name] = block([row for row in samples if row[0] == name])
+    return report
+
+
+def _ms(value):
+    return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(report):
+    print(f"{'endpoint':<12} {'requests':>9} {'req/s':>9} {'ok/s':>9} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    rows = list(report["endpoints"].items()) + [("all", report)]
+    for name, block in rows:
+        print(f"{name:<12} {block['requests']:>9} {block['throughput_rps']:>9.1f} {block['goodput_rps']:>9.1f} "
+              f"{block['error_rate']:>8.1%} {_ms(block['p50_ms'])} {_ms(block['p95_ms'])} {_ms(block['p99_ms'])} "
+              f"{_ms(block['max_ms'])}")
+    errors = {status: count for status, count in report["statuses"].items() if status != "200"}
+    if errors:
+        print(f"errors by status: {errors}")
+
+
+def _weights(specs):
+    # ["predict=4", "ensemble"] -> {"predict": 4.0, "ensemble": 1.0}
+    weights = {}
+    for spec in specs:
+        name, _, weight = spec.partition("=")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the prediction API")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Base URL of a running server")
+    parser.add_argument("--start-server", action="store_true", help="Start app.py locally and test it instead")
+    parser.add_argument("--port", type=int, help="Port of the started server (default: a free one)")
+    parser.add_argument("--server-cwd", default=REPO_ROOT, help="Working directory of the started server")
+    parser.add_argument("--server-log", default=DEFAULT_SERVER_LOG, help="Output file of the started server")
+    parser.add_argument("--endpoints", nargs="+", default=["predict"],
+                        help=f"name[=weight] of {sorted(ENDPOINTS)}, e.g. predict=4 ensemble=1")
+    parser.add_argument("--coins", nargs="+", default=["BTC", "ETH", "SOL"])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[60, 180, 1440], help="time_period values")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Open loop: total requests per second, latency measured from the scheduled send")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=0.0, help="Unmeasured seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url.rstrip("/")
+    if args.start_server:
+        server, url = start_server(args.port, args.server_cwd, log_path=args.server_log)
+        print(f"Started server on {url}")
+    try:
+        report = run_load(url, _weights(args.endpoints), args.coins, args.horizons, args.concurrency,
+                          args.duration, args.warmup, args.timeout, args.seed, args.rate)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Microbenchmarks of the data and model hot paths on synthetic OHLCV data.
+
+Every benchmark runs at each requested size (bars per coin): load_data,
+prepare_data, preprocess_historical_data and integrate_data on all coins,
+and each selected wrapper's fit and predict on one coin's windows. Each
+case is timed as the best of `--repeat` runs (`--model-repeat` for the model
+cases; predict cases use a model fitted before timing starts). Then it runs once more under
+tracemalloc for its peak Python/numpy allocation; allocations made inside
+TensorFlow or XGBoost are not traced.
+
+With `--save-baseline` the results become the baseline. Otherwise they are
+compared with it, and the run exits with status 1 when a case's throughput
+drops more than `--threshold` below the baseline (or its peak memory grows
+more than `--memory-threshold`).
+
+Example:
+    python -m benchmarks.run --sizes 1000 100000 1000000 --save-baseline
+    python -m benchmarks.run --sizes 1000 100000 1000000
+    python -m benchmarks.run --only prepare_data --sizes 10000000
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+# benchmarks time the fits themselves; don't append them to the training telemetry
+os.environ.setdefault("TRAINING_TELEMETRY", "")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data loader"))
+
+from dataset import load_data, prepare_data  # noqa: E402
+from train_matrix import DEFAULT_MODEL_ARGS, window_frame  # noqa: E402
+
+from .synthetic import multi_coin_ohlcv, write_combined_csv, write_historical_csv  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_MODELS = ["random_forest", "xgboost", "lstm"]
+LOOK_BACK = 5
+
+
+def measure(fn, repeat=3):
+    """
+    Time `fn` as the best of `repeat` runs, then trace one more run's peak allocation.
+
+    Returns:
+        tuple: (best seconds, peak traced MB).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+class Workload:
+    """
+    Synthetic data of one size. Files and windows are only built for the cases that need them.
+    """
+
+    def __init__(self, n_rows, coins, workdir, seed=0):
+        self.n_rows = n_rows
+        self.workdir = workdir
+        self.seed = seed
+        self.bars = multi_coin_ohlcv(n_rows, coins, seed=seed)
+        self.coins = list(self.bars)
+
+    @cached_property
+    def data_dir(self):
+        data_dir = os.path.join(self.workdir, "data loader")
+        for coin, df in self.bars.items():
+            write_combined_csv(df, data_dir, coin)
+        return data_dir
+
+    @cached_property
+    def historical_paths(self):
+        return {coin: write_historical_csv(df, os.path.join(self.workdir, f"{coin} Historical Data.csv"))
+                for coin, df in self.bars.items()}
+
+    @cached_property
+    def real_time(self):
+        # new bars per coin, continuing after the history, as fetch_realtime_data returns them
+        frames = {}
+        for coin, df in self.bars.items():
+            new = multi_coin_ohlcv(max(self.n_rows // 100, 1), [coin], seed=self.seed + 100)[coin]
+            new['Date'] = new['Date'] + (df['Date'].iloc[-1] - new['Date'].iloc[0]) + pd.Timedelta("1min")
+            frames[coin] = new
+        return frames
+
+    @cached_property
+    def windows(self):
+        return prepare_data(self.bars[self.coins[0]], LOOK_BACK)
+
+    @cached_property
+    def dates(self):
+        # target date of each window, as int64 nanoseconds for window_frame
+        return self.bars[self.coins[0]]['Date'].to_numpy(dtype="datetime64[ns]")[LOOK_BACK:].view("int64")
+
+
+def data_cases(workload, selected):
+    # name -> (callable, rows processed per call); inputs are built here, outside the timed calls
+    from historical import preprocess_historical_data
+    from integrate import integrate_data
+
+    coins = workload.coins
+    total = workload.n_rows * len(coins)
+    cases = {}
+    if selected("load_data"):
+        data_dir = workload.data_dir
+        cases["load_data"] = (lambda: [load_data(coin, data_dir=data_dir) for coin in coins], total)
+    if selected("prepare_data"):
+        cases["prepare_data"] = (lambda: [prepare_data(df, LOOK_BACK) for df in workload.bars.values()], total)
+    if selected("preprocess_historical_data"):
+        paths = workload.historical_paths
+        cases["preprocess_historical_data"] = (lambda: preprocess_historical_data(paths), total)
+    if selected("integrate_data"):
+        historical = {coin: df.copy() for coin, df in workload.bars.items()}
+        real_time = workload.real_time
+        # integrate_data renames the real-time columns in place, so give it fresh frames
+        cases["integrate_data"] = (
+            lambda: integrate_data(historical, {coin: df.copy() for coin, df in real_time.items()}), total)
+    return cases
+
+
+def model_cases(workload, model_names, model_args, selected, train_fraction=0.8):
+    model_names = [name for name in model_names if selected(f"{name}.fit") or selected(f"{name}.predict")]
+    if not model_names:
+        return {}
+    from argparse import Namespace
+
+    from models import MODELS
+
+    cases = {}
+    split = int(len(workload.windows) * train_fraction)
+    for name in model_names:
+        frame = window_frame(workload.windows, workload.dates, name)
+        train, test = frame.iloc[:split], frame.iloc[split:].drop(columns=['Price'])
+        args = Namespace(**dict(model_args, coin=workload.coins[0]))
+
+        def fit(name=name, train=train, args=args):
+            model = MODELS[name](args)
+            model.fit(train.copy())
+            return model
+
+        if selected(f"{name}.fit"):
+            cases[f"{name}.fit"] = (fit, len(train))
+        if selected(f"{name}.predict"):
+            # fitted here, so the timed calls measure predict alone
+            model = fit()
+            cases[f"{name}.predict"] = (lambda model=model, test=test: model.predict(test.copy()), len(test))
+    return cases
+
+
+def run(sizes, coins=3, model_names=DEFAULT_MODELS, model_max_rows=100000, repeat=3, model_repeat=3,
+        only=None, model_args=None, seed=0):
+    """
+    Run every benchmark case at every size.
+
+    Args:
+        sizes (list): Bars per coin.
+        coins (int): Number of coins in the data benchmarks.
+        model_names (list): Keys of models.MODELS to fit and predict.
+        model_max_rows (int): Largest size the model cases run at.
+        repeat (int): Timed runs per data case.
+        model_repeat (int): Timed runs per model case (best is kept).
+        only (list): Substrings; only cases whose name contains one of them run.
+        model_args (dict): Overrides for DEFAULT_MODEL_ARGS.
+        seed (int): Random seed of the synthetic data.
+
+    Returns:
+        list: One dict per case and size with 'name', 'rows', 'seconds', 'rows_per_sec' and 'peak_mb'.
+    """
+    args = dict(DEFAULT_MODEL_ARGS, epochs=5)
+    args.update(model_args or {})
+    results = []
+
+    def selected(name):
+        return not only or any(pattern in name for pattern in only)
+
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory(prefix="crypto-bench-") as workdir:
+            workload = Workload(n_rows, coins, workdir, seed)
+            cases = {name: (fn, rows, repeat) for name, (fn, rows) in data_cases(workload, selected).items()}
+            if n_rows <= model_max_rows:
+                cases.update({name: (fn, rows, model_repeat) for name, (fn, rows)
+                              in model_cases(workload, model_names, args, selected).items()})
+            for name, (fn, rows, case_repeat) in cases.items():
+                seconds, peak_mb = measure(fn, case_repeat)
+                result = {"name": name, "rows": n_rows, "seconds": seconds,
+                          "rows_per_sec": rows / seconds if seconds > 0 else float("inf"), "peak_mb": peak_mb}
+                print(f"{name:<30} {n_rows:>10} rows  {seconds:10.4f} s  {result['rows_per_sec']:14.0f} rows/s  "
+                      f"{peak_mb:9.1f} MB", flush=True)
+                results.append(result)
+    return results
+
+
+def _key(result):
+    return f"{result['name']}@{result['rows']}"
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    baseline = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor(), "cpus": os.cpu_count(),
+                    "numpy": np.__version__, "pandas": pd.__version__},
+        "results": {_key(result): result for result in results},
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def compare(results, baseline, threshold=0.2, memory_threshold=None):
+    """
+    Find cases that regressed against a baseline.
+
+    Args:
+        results (list): Output of run.
+        baseline (dict): Saved baseline.
+        threshold (float): Allowed relative drop in rows/sec.
+        memory_threshold (float): Allowed relative growth of peak MB, or None to ignore memory.
+
+    Returns:
+        list: Messages, one per regression. Cases missing from the baseline are skipped.
+    """
+    regressions = []
+    for result in results:
+        base = baseline["results"].get(_key(result))
+        if base is None:
+            continue
+        ratio = result["rows_per_sec"] / base["rows_per_sec"]
+        if ratio < 1 - threshold:
+            regressions.append(f"{_key(result)}: {result['rows_per_sec']:.0f} rows/s vs baseline "
+                               f"{base['rows_per_sec']:.0f} ({ratio - 1:+.0%})")
+        if memory_threshold is not None and base["peak_mb"] > 0:
+            growth = result["peak_mb"] / base["peak_mb"] - 1
+            if growth > memory_threshold:
+                regressions.append(f"{_key(result)}: peak {result['peak_mb']:.1f} MB vs baseline "
+                                   f"{base['peak_mb']:.1f} MB ({growth:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data and model hot paths on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Bars per coin")
+    parser.add_argument("--coins", type=int, default=3)
+    parser.add_argument("--models", nargs="*", default=DEFAULT_MODELS, help="Keys of models.MODELS")
+    parser.add_argument("--model-max-rows", type=int, default=100000,
+                        help="Largest size the model fit/predict cases run at")
+    parser.add_argument("--epochs", type=int, default=5, help="Epochs of the Keras model cases")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per data case (best is kept)")
+    parser.add_argument("--model-repeat", type=int, default=3, help="Timed runs per model case (best is kept)")
+    parser.add_argument("--only", nargs="*", help="Run only cases whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Fail when throughput drops more than this fraction below the baseline")
+    parser.add_argument("--memory-threshold", type=float, default=None,
+                        help="Fail when peak memory grows more than this fraction above the baseline")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.coins, args.models, args.model_max_rows, args.repeat, args.model_repeat,
+                  args.only, {"epochs": args.epochs}, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Saved baseline of {len(results)} cases to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        return 1
+    print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -54,33 +54,32 @@ if __name__ == "__main__":
     combined_data = integrate_data(historical_data, real_time_data)
     
     # Save combined data to CSV files
-   # Save combined data to CSV files
-for coin, df in combined_data.items():
-    file_name = f"Combined_{coin}_Data.csv"
+    for coin, df in combined_data.items():
+        file_name = f"Combined_{coin}_Data.csv"
     
-    try:
-        # Load existing data
-        existing_data = pd.read_csv(file_name)
+        try:
+            # Load existing data
+            existing_data = pd.read_csv(file_name)
         
-        # Combine new and existing data
-        df = pd.concat([existing_data, df], ignore_index=True)
+            # Combine new and existing data
+            df = pd.concat([existing_data, df], ignore_index=True)
         
-    except FileNotFoundError:
-        pass  # If the file doesn't exist, just use the new data
+        except FileNotFoundError:
+            pass  # If the file doesn't exist, just use the new data
 
-    # Ensure the timestamp column is in datetime format
-    timestamp_col = df.columns[0]  # Assuming the first column is the timestamp
-    df[timestamp_col] = pd.to_datetime(df[timestamp_col], errors='coerce')
+        # Ensure the timestamp column is in datetime format
+        timestamp_col = df.columns[0]  # Assuming the first column is the timestamp
+        df[timestamp_col] = pd.to_datetime(df[timestamp_col], errors='coerce')
     
-    # Drop rows with invalid timestamps (if any)
-    df.dropna(subset=[timestamp_col], inplace=True)
+        # Drop rows with invalid timestamps (if any)
+        df.dropna(subset=[timestamp_col], inplace=True)
 
-    # Sort the combined data by the timestamp
-    df.sort_values(by=timestamp_col, inplace=True)
+        # Sort the combined data by the timestamp
+        df.sort_values(by=timestamp_col, inplace=True)
 
-    # Reset the index
-    df.reset_index(drop=True, inplace=True)
+        # Reset the index
+        df.reset_index(drop=True, inplace=True)
 
-    # Save the final combined data
-    df.to_csv(file_name, index=False)
-    print(f"Saved combined data for {coin} to {file_name}")
+        # Save the final combined data
+        df.to_csv(file_name, index=False)
+        print(f"Saved combined data for {coin} to {file_name}")
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+NUMERIC_COLUMNS = ['Price', 'Open', 'High', 'Low', 'Vol.', 'Change %']
+
+# combined price histories written by "data loader/integrate.py"
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data loader")
+
+
+def data_path(coin, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"Combined_{coin}_Data.csv")
+
+
+def available_coins(data_dir=DATA_DIR):
+    # coins with a combined price history in data_dir
+    prefix, suffix = "Combined_", "_Data.csv"
+    return sorted(name[len(prefix):-len(suffix)] for name in os.listdir(data_dir)
+                  if name.startswith(prefix) and name.endswith(suffix))
+
+
+def load_data(coin, include_date_for_time_series=True, data_dir=DATA_DIR):
+    """
+    Load and clean the combined price history of a coin.
+
+    Same cleaning as the load_data helpers in app.py and the train scripts.
+
+    Args:
+        coin (str): Coin symbol, e.g. "BTC".
+        include_date_for_time_series (bool): Keep the 'Date' column.
+        data_dir (str): Directory holding the Combined_<coin>_Data.csv files.
+
+    Returns:
+        pd.DataFrame: Rows sorted by date with numeric price columns.
+    """
+    df = pd.read_csv(data_path(coin, data_dir))
+
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df.dropna(subset=['Date'], inplace=True)
+    df = df.sort_values(by='Date')
+
+    if not include_date_for_time_series:
+        df.drop(columns=['Date'], inplace=True)
+
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.dropna(subset=NUMERIC_COLUMNS, inplace=True)
+    return df
+
+
+def prepare_data(df, look_back=5, horizon=1):
+    """
+    Build flattened look-back windows and their targets in one strided pass.
+
+    Row i holds the `look_back` rows starting at i, flattened row by row,
+    followed by the price `horizon` steps after the window. With horizon=1 this
+    matches the loop-based prepare_data in the train scripts.
+
+    Args:
+        df (pd.DataFrame): Price data with 'Price' as the first numeric column.
+        look_back (int): Rows per window.
+        horizon (int): Steps ahead of the window the target is taken from.
+
+    Returns:
+        np.ndarray: Array of shape (n_windows, look_back * n_columns + 1).
+    """
+    values = df.drop(columns=['Date'], errors='ignore').to_numpy(dtype=float)
+    n_windows = len(values) - look_back - horizon + 1
+    if n_windows <= 0:
+        return np.empty((0, look_back * values.shape[1] + 1))
+    # (n, lb, k) view of every window, copied once by the reshape
+    windows = sliding_window_view(values, look_back, axis=0)[:n_windows].transpose(0, 2, 1)
+    windows = windows.reshape(n_windows, -1)
+    target = values[look_back + horizon - 1:look_back + horizon - 1 + n_windows, 0]
+    return np.column_stack([windows, target])
+
+
+def window_columns(n_columns):
+    # column names used by the scripts when windows are wrapped in a DataFrame
+    return [f"feature_{i}" for i in range(n_columns - 1)] + ['Price']
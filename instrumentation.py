@@ -0,0 +1,167 @@
+"""
+Low-overhead request instrumentation exported in the Prometheus text format.
+
+Counters and histograms are kept in process memory behind one lock per
+metric; recording a value is a dict lookup and a bisect. `stage` times a block
+of code into the shared stage histogram, labelled by stage, coin and model, and
+`REGISTRY.expose()` renders everything for a /metrics endpoint.
+
+Example:
+    with stage("load_data", coin="BTC"):
+        df = load_data("BTC")
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; spans a cached prediction (ms) up to a full LSTM fit (minutes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                   120.0, 300.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        bounds = self.buckets + (float("inf"),)
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def expose(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            name = f"{metric.name}_total" if metric.kind == "counter" else metric.name
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "crypto_stage_duration_seconds", "Time spent in each prediction stage.", ["stage", "coin", "model"]))
+REQUESTS = REGISTRY.register(Counter(
+    "crypto_requests", "Prediction requests served.", ["endpoint", "coin", "tier"]))
+MODEL_CACHE = REGISTRY.register(Counter(
+    "crypto_model_cache", "Lookups of resident fitted models.", ["coin", "model", "result"]))
+
+
+# callable(name, coin, model, start, seconds) collecting spans of a profiled request, if any
+span_recorder = contextvars.ContextVar("span_recorder", default=None)
+
+
+@contextmanager
+def stage(name, coin="", model=""):
+    """
+    Time a block into crypto_stage_duration_seconds.
+
+    Args:
+        name (str): Stage, e.g. "load_data", "window", "scale", "fit", "predict", "serialize".
+        coin (str): Coin symbol, if known.
+        model (str): Model name, if the stage belongs to one.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name, coin=coin or "", model=model or "")
+        recorder = span_recorder.get()
+        if recorder is not None:
+            recorder(name, coin or "", model or "", start, elapsed)
@@ -10,16 +10,39 @@ from keras.layers import Activation, Dense,Dropout
 
 from sklearn.preprocessing import MinMaxScaler
 
+from .keras_utils import EpochTelemetry, budgeted_fit, fit_range_scaler, fit_stable_scaler, has_drifted, replay_sample
+from .streaming import WindowSequence, window_range
+from .telemetry import recorded, stage
+
 
 class MyGRU:
-    sc_in = MinMaxScaler(feature_range=(0, 1))
-    sc_out = MinMaxScaler(feature_range=(0, 1))
 
     def __init__(self, args):
         self.model = Sequential()
         self.is_model_created = False
         self.hidden_dim = args.hidden_dim
         self.epochs = args.epochs
+        self.coin = getattr(args, 'coin', '')
+        # scalers are per instance so models trained on different coins don't share ranges
+        self.sc_in = MinMaxScaler(feature_range=(0, 1))
+        self.sc_out = MinMaxScaler(feature_range=(0, 1))
+        # incremental (partial_fit) settings
+        self.fine_tune_epochs = getattr(args, 'fine_tune_epochs', 5)
+        self.replay_size = getattr(args, 'replay_size', 256)
+        self.scaler_headroom = getattr(args, 'scaler_headroom', 0.2)
+        self.drift_tolerance = getattr(args, 'drift_tolerance', 0.0)
+        self.rng = np.random.default_rng(getattr(args, 'seed', None))
+        self.n_seen = 0
+        # budgeted training: early stopping on a time-ordered validation tail and a wall-clock cap
+        self.budgeted = getattr(args, 'budgeted', False)
+        self.validation_fraction = getattr(args, 'validation_fraction', 0.1)
+        self.patience = getattr(args, 'patience', 5)
+        self.max_seconds = getattr(args, 'max_seconds', None)
+        self.batch_size = getattr(args, 'batch_size', None)
+        # out-of-core (fit_stream) settings
+        self.stream_batch_size = getattr(args, 'stream_batch_size', 50)
+        self.prefetch_workers = getattr(args, 'prefetch_workers', 2)
+        self.prefetch_batches = getattr(args, 'prefetch_batches', 8)
 
 
     def create_model(self, shape_):
@@ -29,6 +52,7 @@ class MyGRU:
         self.model.add(Dense(1))
         self.model.compile(loss='mean_squared_error', optimizer='adam')
 
+    @recorded('gru')
     def fit(self, data_x):
         data_x = np.array(data_x)
         train_x = data_x[:, 1:-1]
@@ -38,20 +62,74 @@ class MyGRU:
             self.create_model(train_x.shape[1])
             self.is_model_created = True
 
-        train_x = self.sc_in.fit_transform(train_x)
-        train_y = train_y.reshape(-1, 1)
-        train_y = self.sc_out.fit_transform(train_y)
+        with stage('scale', self.coin, 'gru'):
+            train_x = fit_stable_scaler(self.sc_in, train_x, self.scaler_headroom)
+            train_y = train_y.reshape(-1, 1)
+            train_y = fit_stable_scaler(self.sc_out, train_y, self.scaler_headroom)
         train_x = np.array(train_x, dtype=float)
         train_y = np.array(train_y, dtype=float)
         train_x = np.reshape(train_x, (train_x.shape[0], 1, train_x.shape[1]))
-        self.model.fit(train_x, train_y, epochs=self.epochs, verbose=0, shuffle=False, batch_size=50)
+        if self.budgeted:
+            self.history = budgeted_fit(self.model, train_x, train_y, self.epochs, self.validation_fraction,
+                                        self.patience, self.max_seconds, self.batch_size, verbose=0,
+                                        callbacks=[EpochTelemetry(len(train_x))])
+        else:
+            self.history = self.model.fit(train_x, train_y, epochs=self.epochs, verbose=0, shuffle=False,
+                                          batch_size=self.batch_size or 50, callbacks=[EpochTelemetry(len(train_x))])
+        self.n_seen = data_x.shape[0]
+
+    @recorded('gru')
+    def fit_stream(self, store, look_back, stop=None):
+        # trains on windows generated batch by batch from a memory-mapped BarStore,
+        # so the full windowed history is never materialized
+        n_features = look_back * len(store.columns) - 1
+        if self.is_model_created == False:
+            self.create_model(n_features)
+            self.is_model_created = True
+
+        low, high = store.column_range()
+        fit_range_scaler(self.sc_in, *window_range(low, high, look_back), self.scaler_headroom)
+        fit_range_scaler(self.sc_out, low[:1], high[:1], self.scaler_headroom)
+        batches = WindowSequence(store, look_back, self.stream_batch_size, self.sc_in, self.sc_out, stop=stop,
+                                 workers=self.prefetch_workers, max_queue_size=self.prefetch_batches)
+        self.model.fit(batches, epochs=self.epochs, verbose=0, shuffle=False,
+                       callbacks=[EpochTelemetry(batches.stop - batches.start)])
+        self.n_seen = batches.stop
+
+    @recorded('gru')
+    def partial_fit(self, data_x):
+        # data_x is the full history; rows past the ones seen by the last fit are new
+        data_x = np.array(data_x)
+        if self.is_model_created == False or self.n_seen == 0 or data_x.shape[0] < self.n_seen:
+            self.fit(data_x)
+            return
+        new_rows = data_x[self.n_seen:]
+        if new_rows.shape[0] == 0:
+            return
+
+        # new rows outside the scaler ranges need a full refit
+        if has_drifted(self.sc_in, new_rows[:, 1:-1], self.drift_tolerance) or \
+                has_drifted(self.sc_out, new_rows[:, -1:], self.drift_tolerance):
+            self.fit(data_x)
+            return
+
+        replay = replay_sample(data_x[:self.n_seen], self.replay_size, self.rng)
+        rows = np.concatenate([replay, new_rows])
+        train_x = self.sc_in.transform(rows[:, 1:-1])
+        train_y = self.sc_out.transform(rows[:, -1:])
+        train_x = np.array(train_x, dtype=float)
+        train_y = np.array(train_y, dtype=float)
+        train_x = np.reshape(train_x, (train_x.shape[0], 1, train_x.shape[1]))
+        self.model.fit(train_x, train_y, epochs=self.fine_tune_epochs, verbose=0, shuffle=False, batch_size=50,
+                       callbacks=[EpochTelemetry(len(train_x))])
+        self.n_seen = data_x.shape[0]
 
     def predict(self, test_x):
-        test_x = np.array(test_x.iloc[:, 1:], dtype=float)
-        test_x = self.sc_in.transform(test_x)
+        test_x = np.array(test_x, dtype=float)[:, 1:]
+        with stage('scale', self.coin, 'gru'):
+            test_x = self.sc_in.transform(test_x)
         test_x = np.reshape(test_x, (test_x.shape[0], 1, test_x.shape[1]))
         pred_y = self.model.predict(test_x)
         pred_y = pred_y.reshape(-1, 1)
         pred_y = self.sc_out.inverse_transform(pred_y)
         return pred_y
-
@@ -7,6 +7,7 @@ from .arima import MyARIMA
 from .prophet import MyProphet
 from .xgboost import MyXGboost
 from .neural_prophet import Neural_Prophet
+from .global_model import GlobalLSTM
 
 
 MODELS = {'random_forest': RandomForest,
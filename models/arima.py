@@ -1,24 +1,32 @@
-from statsmodels.tsa.arima_model import ARIMA
-from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.arima.model import ARIMA
 from sklearn.preprocessing import MinMaxScaler
 import numpy as np
 import pandas as pd
 
+from . import order_search
+from .statespace import parse_order
+from .telemetry import recorded
+
 
 class MyARIMA:
-    sc_in = MinMaxScaler(feature_range=(0, 1))
-    sc_out = MinMaxScaler(feature_range=(0, 1))
 
     def __init__(self, args):
         self.train_size = -1
         self.test_size = -1
-        self.order = tuple(map(int, args.order.split(', ')))
+        self.order = parse_order(args.order)
+        self.coin = getattr(args, 'coin', None)
+        self.sc_in = MinMaxScaler(feature_range=(0, 1))
+        self.sc_out = MinMaxScaler(feature_range=(0, 1))
+        # number of update() calls between full MLE refits (0 disables the schedule)
+        self.refit_every = getattr(args, 'refit_every', 30)
+        self.updates_since_fit = 0
+        self.result = None
 
+    @recorded('arima', iterative=False)
     def fit(self, data_x):
         data_x = np.array(data_x)
         train_x = data_x[:, 1:-1]
         train_y = data_x[:, -1]
-        print(train_x)
         self.train_size = train_x.shape[0]
         train_x = self.sc_in.fit_transform(train_x)
         train_y = train_y.reshape(-1, 1)
@@ -28,14 +36,45 @@ class MyARIMA:
         self.model = ARIMA(train_y,
                              exog=train_x,
                              order=self.order)
-        self.result = self.model.fit()
+        # warm start the optimizer from the previous estimates when refitting
+        start_params = None
+        if self.result is not None and len(self.result.params) == len(self.model.start_params):
+            start_params = self.result.params
+        self.result = self.model.fit(start_params=start_params)
+        self.updates_since_fit = 0
+
+    def select_order(self, data_x, coin='default', **kwargs):
+        # search the candidate grid in a process pool and keep the best order for the next fit
+        order, _, results = order_search.select_order(data_x, coin=coin, kind='arima', **kwargs)
+        self.order = order
+        return results
+
+    @recorded('arima', iterative=False)
+    def update(self, data_x):
+        # data_x is the full history; rows past train_size are filtered with the fitted parameters
+        data_x = np.array(data_x)
+        if self.result is None or data_x.shape[0] < self.train_size:
+            self.fit(data_x)
+            return
+        if self.refit_every and self.updates_since_fit + 1 >= self.refit_every:
+            self.fit(data_x)
+            return
+        new_rows = data_x[self.train_size:]
+        if new_rows.shape[0] == 0:
+            return
+
+        new_x = np.array(self.sc_in.transform(new_rows[:, 1:-1]), dtype=float)
+        new_y = np.array(self.sc_out.transform(new_rows[:, -1:]), dtype=float)
+        self.result = self.result.extend(new_y, exog=new_x)
+        self.train_size = data_x.shape[0]
+        self.updates_since_fit += 1
 
     def predict(self, test_x):
         test_x = np.array(test_x.iloc[:, 1:], dtype=float)
         test_x = self.sc_in.transform(test_x)
         self.test_size = test_x.shape[0]
-        pred_y = self.result.predict(start=self.train_size, end=self.train_size + self.test_size - 1, exog=test_x)
-        # pred_y = self.result.predict(exog=test_x)
+        # forecast continues from the end of the (possibly extended) sample
+        pred_y = self.result.forecast(steps=self.test_size, exog=test_x)
         pred_y = pred_y.reshape(-1, 1)
         pred_y = self.sc_out.inverse_transform(pred_y)
         return pred_y
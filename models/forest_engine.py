@@ -0,0 +1,141 @@
+import numpy as np
+
+
+class CompiledForest:
+    """
+    Array-backed inference engine for fitted sklearn regression forests.
+
+    All trees are flattened into shared node arrays (feature, threshold, left and
+    right child, leaf value). Prediction walks every row through every tree at
+    once with numpy fancy indexing, so small batches avoid sklearn's per-tree
+    dispatch. Several forests (e.g. one per coin) can be stacked into one engine
+    and each row routed to its own forest in the same call.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, n_trees, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots        # (n_forests, max_trees), padded with a zero-valued leaf
+        self.n_trees = n_trees    # (n_forests,)
+        self.depth = depth
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Compile a fitted RandomForestRegressor (or any ensemble of regression trees).
+
+        Args:
+            model: Fitted estimator with `estimators_` of single-output trees.
+
+        Returns:
+            CompiledForest: Engine holding one forest.
+        """
+        estimators = getattr(model, "estimators_", [model])
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(tree.node_count) + offset
+            # leaves point to themselves so extra traversal steps are no-ops
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+
+        # trailing zero-valued leaf used to pad forests with fewer trees when stacking
+        features.append([0])
+        thresholds.append([np.inf])
+        lefts.append([offset])
+        rights.append([offset])
+        values.append([0.0])
+
+        return cls(feature=np.concatenate(features).astype(np.intp),
+                   threshold=np.concatenate(thresholds).astype(np.float64),
+                   left=np.concatenate(lefts).astype(np.intp),
+                   right=np.concatenate(rights).astype(np.intp),
+                   value=np.concatenate(values).astype(np.float64),
+                   roots=np.array([roots], dtype=np.intp),
+                   n_trees=np.array([len(roots)]),
+                   depth=depth)
+
+    @classmethod
+    def stack(cls, forests):
+        """
+        Combine compiled forests into one engine, one forest index per input.
+
+        Args:
+            forests (list): CompiledForest instances.
+
+        Returns:
+            CompiledForest: Engine whose forest `i` is `forests[i]`.
+        """
+        max_trees = max(f.roots.shape[1] for f in forests)
+        features, thresholds, lefts, rights, values, roots, n_trees = [], [], [], [], [], [], []
+        offset = 0
+        for forest in forests:
+            pad_leaf = offset + len(forest.value) - 1
+            for forest_roots, count in zip(forest.roots, forest.n_trees):
+                padded = np.full(max_trees, pad_leaf, dtype=np.intp)
+                padded[:forest_roots.shape[0]] = forest_roots + offset
+                roots.append(padded)
+                n_trees.append(count)
+            features.append(forest.feature)
+            thresholds.append(forest.threshold)
+            lefts.append(forest.left + offset)
+            rights.append(forest.right + offset)
+            values.append(forest.value)
+            offset += len(forest.value)
+        return cls(feature=np.concatenate(features), threshold=np.concatenate(thresholds),
+                   left=np.concatenate(lefts), right=np.concatenate(rights),
+                   value=np.concatenate(values), roots=np.array(roots),
+                   n_trees=np.array(n_trees), depth=max(f.depth for f in forests))
+
+    def predict(self, X, forest_index=None):
+        """
+        Predict a batch of rows.
+
+        Args:
+            X (array-like): Features, shape (n_rows, n_features), in training column order.
+            forest_index (array-like): Forest to use for each row. Defaults to forest 0.
+
+        Returns:
+            np.ndarray: Predictions of shape (n_rows,).
+
+        Note:
+            A NaN feature fails every `<=` test and always goes to the right
+            child. This differs from sklearn's missing-value support, which
+            sends NaN to the side learned in training. Impute NaN first when
+            the forest was trained on data with missing values.
+        """
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if forest_index is None:
+            forest_index = np.zeros(X.shape[0], dtype=np.intp)
+        forest_index = np.asarray(forest_index, dtype=np.intp)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = self.roots[forest_index]
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].sum(axis=1) / self.n_trees[forest_index]
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots, n_trees=self.n_trees,
+                 depth=self.depth)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path)
+        return cls(feature=arrays["feature"], threshold=arrays["threshold"], left=arrays["left"],
+                   right=arrays["right"], value=arrays["value"], roots=arrays["roots"],
+                   n_trees=arrays["n_trees"], depth=int(arrays["depth"]))
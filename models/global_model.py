@@ -0,0 +1,184 @@
+import pickle
+
+import numpy as np
+
+import keras
+from keras.models import Sequential
+from keras.layers import Dense, Input
+from keras.layers import LSTM
+
+from sklearn.preprocessing import MinMaxScaler
+
+from .keras_utils import EpochTelemetry, ReplayReservoir, budgeted_fit, fit_range_scaler, has_drifted
+from .telemetry import recorded
+
+
+class GlobalLSTM:
+    """
+    One LSTM trained across all coins.
+
+    Each coin's windows are scaled with that coin's own scalers, tagged with a
+    one-hot coin feature and stacked into a single (rows, 1, features + max_coins)
+    panel tensor. The one-hot width is fixed at `max_coins`, so adding a coin
+    doesn't change the network: it is fine-tuned on the new coin (plus a replay
+    sample of the others) instead of a new model being trained and stored.
+    The replay sample of each coin is a reservoir of at most `replay_size`
+    rows drawn uniformly from everything it was trained on, so memory does not
+    grow with the history.
+
+    A coin's scalers are fitted when it is first seen and refitted only when
+    new rows drift out of their range, on the min/max of everything the coin
+    was trained on, so fine-tuning batches don't rescale the coin.
+    """
+
+    def __init__(self, args):
+        self.model = None
+        self.hidden_dim = args.hidden_dim
+        self.epochs = args.epochs
+        self.max_coins = getattr(args, 'max_coins', 32)
+        self.fine_tune_epochs = getattr(args, 'fine_tune_epochs', 5)
+        self.replay_size = getattr(args, 'replay_size', 256)
+        self.scaler_headroom = getattr(args, 'scaler_headroom', 0.2)
+        self.drift_tolerance = getattr(args, 'drift_tolerance', 0.0)
+        self.batch_size = getattr(args, 'batch_size', None)
+        self.budgeted = getattr(args, 'budgeted', False)
+        self.validation_fraction = getattr(args, 'validation_fraction', 0.1)
+        self.patience = getattr(args, 'patience', 5)
+        self.max_seconds = getattr(args, 'max_seconds', None)
+        self.rng = np.random.default_rng(getattr(args, 'seed', None))
+        self.coin_index = {}
+        self.sc_in = {}
+        self.sc_out = {}
+        # coin -> (per-column min, per-column max) of every row it was trained on
+        self.ranges = {}
+        self.replay = {}
+        self.n_features = None
+
+    def create_model(self, shape_):
+        self.model = Sequential()
+        self.model.add(Input(shape=(1, shape_)))
+        self.model.add(LSTM(self.hidden_dim, return_sequences=True))
+        self.model.add(LSTM(self.hidden_dim))
+        self.model.add(Dense(1))
+        self.model.compile(loss='mean_squared_error', optimizer='adam')
+
+    def _register(self, coin, n_features):
+        if self.n_features is None:
+            self.n_features = n_features
+        elif n_features != self.n_features:
+            raise ValueError(f"{coin} has {n_features} features, the global model expects {self.n_features}")
+        if coin not in self.coin_index:
+            if len(self.coin_index) >= self.max_coins:
+                raise ValueError(f"The global model holds at most {self.max_coins} coins")
+            self.coin_index[coin] = len(self.coin_index)
+
+    def _fit_scalers(self, coin):
+        low, high = self.ranges[coin]
+        fit_range_scaler(self.sc_in.setdefault(coin, MinMaxScaler(feature_range=(0, 1))), low[1:-1], high[1:-1],
+                         self.scaler_headroom)
+        fit_range_scaler(self.sc_out.setdefault(coin, MinMaxScaler(feature_range=(0, 1))), low[-1:], high[-1:],
+                         self.scaler_headroom)
+
+    def _update_scalers(self, coin, rows):
+        low, high = np.nanmin(rows, axis=0), np.nanmax(rows, axis=0)
+        if coin not in self.ranges:
+            self.ranges[coin] = (low, high)
+            self._fit_scalers(coin)
+            return
+        seen_low, seen_high = self.ranges[coin]
+        self.ranges[coin] = (np.minimum(seen_low, low), np.maximum(seen_high, high))
+        if has_drifted(self.sc_in[coin], rows[:, 1:-1], self.drift_tolerance) or \
+                has_drifted(self.sc_out[coin], rows[:, -1:], self.drift_tolerance):
+            self._fit_scalers(coin)
+
+    def _panel(self, coin, features):
+        # per-coin scaled features followed by the coin's one-hot columns
+        one_hot = np.zeros((features.shape[0], self.max_coins))
+        one_hot[:, self.coin_index[coin]] = 1.0
+        return np.concatenate([features, one_hot], axis=1)
+
+    def _stack(self, data):
+        # interleave coins by relative position in their history so that unshuffled
+        # batches move forward in time across all coins together
+        xs, ys, positions = [], [], []
+        for coin, rows in data.items():
+            train_x = self.sc_in[coin].transform(rows[:, 1:-1])
+            train_y = self.sc_out[coin].transform(rows[:, -1:])
+            xs.append(self._panel(coin, train_x))
+            ys.append(train_y)
+            positions.append(np.linspace(0, 1, len(rows)))
+        order = np.argsort(np.concatenate(positions), kind='stable')
+        train_x = np.concatenate(xs)[order]
+        train_y = np.concatenate(ys)[order]
+        return np.reshape(train_x, (train_x.shape[0], 1, train_x.shape[1])), train_y
+
+    @recorded('global_lstm')
+    def fit(self, data):
+        """
+        Train on several coins at once.
+
+        The first call trains for `epochs`. Later calls fine-tune the existing
+        weights for `fine_tune_epochs` on the given coins, mixed with a replay
+        sample of every coin seen before, including the ones being updated. The
+        caller's dict is not modified.
+
+        Args:
+            data (dict): Coin symbol to new windowed rows (features, then 'Price' last).
+        """
+        batch = {coin: np.array(rows, dtype=float) for coin, rows in data.items()}
+        for coin, rows in batch.items():
+            self._register(coin, rows.shape[1] - 2)
+            self._update_scalers(coin, rows)
+
+        train_data = dict(batch)
+        if self.model is None:
+            self.create_model(self.n_features + self.max_coins)
+            epochs = self.epochs
+        else:
+            epochs = self.fine_tune_epochs
+            for coin, reservoir in self.replay.items():
+                replay = reservoir.sample()
+                if replay is None or not len(replay):
+                    continue
+                # updated coins replay their own past too, so their earlier regime isn't forgotten
+                train_data[coin] = np.concatenate([replay, batch[coin]]) if coin in batch else replay
+
+        train_x, train_y = self._stack(train_data)
+        if self.budgeted:
+            budgeted_fit(self.model, train_x, train_y, epochs, self.validation_fraction, self.patience,
+                         self.max_seconds, self.batch_size, callbacks=[EpochTelemetry(len(train_x))])
+        else:
+            self.model.fit(train_x, train_y, epochs=epochs, verbose=0, shuffle=False,
+                           batch_size=self.batch_size or 50, callbacks=[EpochTelemetry(len(train_x))])
+        for coin, rows in batch.items():
+            self.replay.setdefault(coin, ReplayReservoir(self.replay_size)).add(rows, self.rng)
+
+    def predict(self, coin, test_x):
+        test_x = np.array(test_x, dtype=float)[:, 1:]
+        test_x = self._panel(coin, self.sc_in[coin].transform(test_x))
+        test_x = np.reshape(test_x, (test_x.shape[0], 1, test_x.shape[1]))
+        pred_y = self.model.predict(test_x, verbose=0)
+        pred_y = pred_y.reshape(-1, 1)
+        pred_y = self.sc_out[coin].inverse_transform(pred_y)
+        return pred_y
+
+    def save(self, path):
+        # weights in <path>.keras, coin vocabulary, scalers, ranges and replay reservoirs in <path>.pkl
+        self.model.save(f"{path}.keras")
+        with open(f"{path}.pkl", "wb") as f:
+            pickle.dump({'coin_index': self.coin_index, 'sc_in': self.sc_in, 'sc_out': self.sc_out,
+                         'n_features': self.n_features, 'max_coins': self.max_coins,
+                         'ranges': self.ranges, 'replay': self.replay}, f)
+
+    def load(self, path):
+        self.model = keras.models.load_model(f"{path}.keras")
+        with open(f"{path}.pkl", "rb") as f:
+            state = pickle.load(f)
+        self.coin_index = state['coin_index']
+        self.sc_in = state['sc_in']
+        self.sc_out = state['sc_out']
+        self.n_features = state['n_features']
+        self.max_coins = state['max_coins']
+        self.ranges = state['ranges']
+        self.replay = state['replay']
+        return self
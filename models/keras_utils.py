@@ -0,0 +1,252 @@
+import time
+
+import keras
+import numpy as np
+
+from .telemetry import current_run
+
+
+def fit_stable_scaler(scaler, values, headroom=0.0):
+    """
+    Fit a MinMaxScaler on the range of `values` widened by `headroom`.
+
+    The extra room keeps the scaled range stable when new rows move slightly
+    past the historical min/max, so a fitted network can keep training on
+    them without the scaler being refit.
+
+    Args:
+        scaler (MinMaxScaler): Scaler to fit in place.
+        values (np.ndarray): 2D array of raw values.
+        headroom (float): Fraction of the observed range added on each side.
+
+    Returns:
+        np.ndarray: `values` transformed with the fitted scaler.
+    """
+    values = np.asarray(values, dtype=float)
+    fit_range_scaler(scaler, np.nanmin(values, axis=0), np.nanmax(values, axis=0), headroom)
+    return scaler.transform(values)
+
+
+def fit_range_scaler(scaler, low, high, headroom=0.0):
+    """
+    Fit a MinMaxScaler on known per-feature bounds widened by `headroom`.
+
+    Used when the data is never held in memory at once, e.g. when the bounds
+    come from a chunked pass over a memory-mapped store.
+
+    Args:
+        scaler (MinMaxScaler): Scaler to fit in place.
+        low (np.ndarray): Per-feature minimum.
+        high (np.ndarray): Per-feature maximum.
+        headroom (float): Fraction of the range added on each side.
+    """
+    low = np.asarray(low, dtype=float)
+    high = np.asarray(high, dtype=float)
+    pad = (high - low) * headroom
+    scaler.fit(np.vstack([low - pad, high + pad]))
+
+
+def has_drifted(scaler, values, tolerance=0.0):
+    """
+    Check whether `values` fall outside the range a fitted scaler was built for.
+
+    Args:
+        scaler (MinMaxScaler): Fitted scaler.
+        values (np.ndarray): 2D array of raw values.
+        tolerance (float): Allowed overshoot beyond the feature range.
+
+    Returns:
+        bool: True if any scaled value lies outside the feature range.
+    """
+    scaled = scaler.transform(np.asarray(values, dtype=float))
+    low, high = scaler.feature_range
+    return bool(np.any(scaled < low - tolerance) or np.any(scaled > high + tolerance))
+
+
+def replay_sample(history, size, rng):
+    """
+    Draw a chronologically ordered random sample of past rows.
+
+    Args:
+        history (np.ndarray): Rows the model has already been trained on.
+        size (int): Maximum number of rows to draw.
+        rng (np.random.Generator): Random generator.
+
+    Returns:
+        np.ndarray: The sampled rows, in their original order.
+    """
+    if size <= 0 or len(history) == 0:
+        return history[:0]
+    if len(history) <= size:
+        return history
+    index = np.sort(rng.choice(len(history), size=size, replace=False))
+    return history[index]
+
+
+class ReplayReservoir:
+    """
+    Bounded uniform sample of every row added so far (reservoir sampling).
+
+    Memory stays at `size` rows however long the history grows, and each row
+    ever added has the same chance of being in the sample.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.rows = None
+        # position of each kept row in the added stream, to return them in order
+        self.positions = np.empty(0, dtype=np.int64)
+        self.seen = 0
+
+    def add(self, rows, rng):
+        if self.size <= 0 or len(rows) == 0:
+            self.seen += len(rows)
+            return
+        if self.rows is None:
+            self.rows = rows[:0].copy()
+        positions = self.seen + np.arange(len(rows))
+        # fill the free slots first
+        free = min(self.size - len(self.rows), len(rows))
+        self.rows = np.concatenate([self.rows, rows[:free]])
+        self.positions = np.concatenate([self.positions, positions[:free]])
+        # row t then replaces a random slot with probability size / (t + 1); when several
+        # rows land on one slot the latest wins, as in the sequential algorithm
+        slots = np.floor(rng.random(len(rows) - free) * (positions[free:] + 1)).astype(np.int64)
+        keep = np.flatnonzero(slots < self.size)
+        if len(keep):
+            last = len(keep) - 1 - np.unique(slots[keep][::-1], return_index=True)[1]
+            keep = keep[last]
+            self.rows[slots[keep]] = rows[free:][keep]
+            self.positions[slots[keep]] = positions[free:][keep]
+        self.seen += len(rows)
+
+    def sample(self):
+        """
+        Return the kept rows in the order they were added.
+        """
+        if self.rows is None:
+            return None
+        return self.rows[np.argsort(self.positions, kind='stable')]
+
+
+class TimeBudget(keras.callbacks.Callback):
+    """
+    Stop training once a wall-clock budget is spent.
+
+    Checked after every batch, and before an epoch that would likely overrun
+    the budget given the duration of the previous one.
+    """
+
+    def __init__(self, max_seconds):
+        super().__init__()
+        self.max_seconds = max_seconds
+        self.exhausted = False
+
+    def on_train_begin(self, logs=None):
+        self.start = time.perf_counter()
+        self.epoch_seconds = 0.0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        if self._elapsed() + self.epoch_seconds > self.max_seconds:
+            self._stop()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch_seconds = time.perf_counter() - self.epoch_start
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self._elapsed() > self.max_seconds:
+            self._stop()
+
+    def _elapsed(self):
+        return time.perf_counter() - self.start
+
+    def _stop(self):
+        self.exhausted = True
+        self.model.stop_training = True
+
+
+class EpochTelemetry(keras.callbacks.Callback):
+    """
+    Report per-epoch duration, throughput and losses to the TrainingRun being recorded.
+
+    Does nothing when the fit isn't recorded (see telemetry.recorded).
+
+    Args:
+        samples (int): Training rows per epoch, for samples/sec.
+    """
+
+    def __init__(self, samples=None):
+        super().__init__()
+        self.samples = samples
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        run = current_run()
+        if run is not None:
+            run.epoch(epoch, time.perf_counter() - self.epoch_start, self.samples, **(logs or {}))
+
+
+def adaptive_batch_size(n_rows, target_steps=100, min_size=32, max_size=512):
+    """
+    Pick a power-of-two batch size giving roughly `target_steps` steps per epoch.
+
+    Small histories keep small batches (more updates per epoch); long ones get
+    larger batches so an epoch doesn't take thousands of steps.
+
+    Args:
+        n_rows (int): Training rows.
+        target_steps (int): Desired optimizer steps per epoch.
+        min_size (int): Smallest batch size.
+        max_size (int): Largest batch size.
+
+    Returns:
+        int: Batch size.
+    """
+    size = 2 ** int(np.ceil(np.log2(max(n_rows / target_steps, 1))))
+    return int(np.clip(size, min_size, max_size))
+
+
+def budgeted_fit(model, train_x, train_y, epochs, validation_fraction=0.1, patience=5, max_seconds=None,
+                 batch_size=None, verbose=0, callbacks=None):
+    """
+    Fit a Keras model with early stopping on a time-ordered validation tail.
+
+    The last `validation_fraction` of the rows is held out (never shuffled in),
+    training stops when the validation loss hasn't improved for `patience`
+    epochs or `max_seconds` have passed, and the best epoch's weights are
+    restored in either case.
+
+    Args:
+        model (keras.Model): Compiled model.
+        train_x (np.ndarray): Model inputs, in time order.
+        train_y (np.ndarray): Targets, in time order.
+        epochs (int): Maximum number of epochs.
+        validation_fraction (float): Fraction of rows at the end used for validation.
+        patience (int): Epochs without improvement before stopping.
+        max_seconds (float): Wall-clock budget, or None for no limit.
+        batch_size (int): Batch size; picked with adaptive_batch_size if None.
+        verbose (int): Keras verbosity.
+        callbacks (list): Extra Keras callbacks.
+
+    Returns:
+        keras.callbacks.History: Training history.
+    """
+    n_val = int(len(train_x) * validation_fraction)
+    if n_val > 0:
+        fit_x, fit_y = train_x[:-n_val], train_y[:-n_val]
+        validation_data = (train_x[-n_val:], train_y[-n_val:])
+        monitor = 'val_loss'
+    else:
+        fit_x, fit_y, validation_data, monitor = train_x, train_y, None, 'loss'
+    if batch_size is None:
+        batch_size = adaptive_batch_size(len(fit_x))
+
+    callbacks = list(callbacks or [])
+    callbacks.append(keras.callbacks.EarlyStopping(monitor=monitor, patience=patience, restore_best_weights=True))
+    if max_seconds is not None:
+        callbacks.append(TimeBudget(max_seconds))
+    return model.fit(fit_x, fit_y, epochs=epochs, batch_size=batch_size, validation_data=validation_data,
+                     shuffle=False, callbacks=callbacks, verbose=verbose)
@@ -1,5 +1,27 @@
+from datetime import timedelta
+
 from neuralprophet import NeuralProphet
 
+from .telemetry import recorded
+
+# per-process cache of the last trained network weights of each coin
+_warm_weights = {}
+
+
+class _WarmNeuralProphet(NeuralProphet):
+    # NeuralProphet builds its network inside fit(), so the previous weights are loaded there
+    warm_state = None
+
+    def _init_model(self):
+        model = super()._init_model()
+        if self.warm_state is not None:
+            try:
+                model.load_state_dict(self.warm_state, strict=False)
+            except RuntimeError:
+                # layer shapes changed (e.g. different regressors), train from scratch
+                pass
+        return model
+
 
 class Neural_Prophet:
 
@@ -12,7 +34,13 @@ class Neural_Prophet:
                               round((args.confidence_level + (1 - args.confidence_level) / 2), 2)]
         self.model = None
         self.regressors = []
+        self.coin = getattr(args, 'coin', None)
+        self.warm_start = getattr(args, 'warm_start', False)
+        # training caps for warm-started fits: epochs and wall-clock seconds
+        self.warm_epochs = getattr(args, 'warm_epochs', 10)
+        self.fit_time_budget = getattr(args, 'fit_time_budget', None)
 
+    @recorded('neural_prophet')
     def fit(self, data_x):
         yearly_seasonality = False
         weekly_seasonality = False
@@ -27,14 +55,22 @@ class Neural_Prophet:
             n_lags = 3 * 24
             daily_seasonality = True
 
-        self.model = NeuralProphet(
+        trainer_config = {}
+        if self.fit_time_budget:
+            trainer_config['max_time'] = timedelta(seconds=self.fit_time_budget)
+        warm_state = _warm_weights.get(self.coin) if self.warm_start else None
+
+        self.model = _WarmNeuralProphet(
             yearly_seasonality=yearly_seasonality,
             weekly_seasonality=weekly_seasonality,
             daily_seasonality=daily_seasonality,
             n_lags=n_lags,
             learning_rate=0.003,
             quantiles=self.quantile_list,
+            epochs=self.warm_epochs if warm_state is not None else None,
+            trainer_config=trainer_config,
         )
+        self.model.warm_state = warm_state
 
         self.regressors = []
         for col in data_x.columns:
@@ -47,10 +83,11 @@ class Neural_Prophet:
         data_x[self.response_col] = data_x[self.response_col].astype(float)
         ml_df1 = data_x.reset_index().rename(columns={self.date_col: 'ds', self.response_col: 'y'})
         self.model.fit(ml_df1)
+        if self.warm_start:
+            _warm_weights[self.coin] = {k: v.detach().clone() for k, v in self.model.model.state_dict().items()}
 
     def predict(self, test_x):
         test_x[self.regressors] = test_x[self.regressors].astype(float)
         test_x = test_x.reset_index().rename(columns={self.date_col: 'ds', self.response_col: 'y'})
         pred_y = self.model.predict(test_x)
         return pred_y.yhat
-
@@ -1,12 +1,20 @@
+import hashlib
+import os
+import pickle
+
 from orbit.models import DLT
 import numpy as np
+import pandas as pd
 from sklearn.preprocessing import MaxAbsScaler
 
+from .telemetry import recorded
+
+# per-process cache of fitted models, keyed by coin
+_fitted = {}
+
 
 class Orbit:
     model = None
-    sc_in = MaxAbsScaler()
-    sc_out = MaxAbsScaler()
 
     def __init__(self, args):
         self.response_col = args.response_col
@@ -16,44 +24,114 @@ class Orbit:
         self.seed = args.seed
         self.global_trend_option = args.global_trend_option
         self.n_bootstrap_draws = args.n_bootstrap_draws
+        self.confidence_level = getattr(args, 'confidence_level', 0.95)
+        self.coin = getattr(args, 'coin', None)
+        self.cache_dir = getattr(args, 'cache_dir', os.path.join('.cache', 'orbit'))
+        self.sc_in = MaxAbsScaler()
+        self.sc_out = MaxAbsScaler()
+        self.rng = np.random.default_rng(self.seed)
+
+    def _dates(self, data_x, dates):
+        # real timestamps from load_data's Date column (or passed separately)
+        if dates is not None:
+            return pd.to_datetime(np.asarray(dates))
+        if self.date_col in data_x.columns:
+            return pd.to_datetime(data_x[self.date_col].to_numpy())
+        return None
+
+    def _digest(self, values, dates):
+        digest = hashlib.sha1(repr((self.estimator, self.seasonality, self.seed,
+                                    self.global_trend_option)).encode())
+        digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+        digest.update(dates.asi8.tobytes())
+        return digest.hexdigest()
+
+    def _cache_path(self):
+        return os.path.join(self.cache_dir, f"orbit_{self.coin}.pkl")
 
-    def fit(self, data_x):
-        print(data_x.shape)
-        regressors = []
+    def _load_cached(self, digest):
+        state = _fitted.get(self.coin)
+        if state is None and os.path.exists(self._cache_path()):
+            with open(self._cache_path(), 'rb') as f:
+                state = pickle.load(f)
+            _fitted[self.coin] = state
+        if state is None or state['digest'] != digest:
+            return False
+        self.__dict__.update({k: v for k, v in state.items() if k != 'digest'})
+        return True
+
+    def _save_cached(self, digest):
+        state = {'digest': digest, 'model': self.model, 'sc_in': self.sc_in, 'sc_out': self.sc_out,
+                 'regressors': self.regressors, 'residuals': self.residuals,
+                 'last_date': self.last_date, 'freq': self.freq}
+        _fitted[self.coin] = state
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._cache_path()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, self._cache_path())
+
+    @recorded('orbit')
+    def fit(self, data_x, dates=None):
+        dates = self._dates(data_x, dates)
+        if dates is None:
+            raise ValueError(f"Orbit needs the '{self.date_col}' column from load_data or explicit dates")
+        self.regressors = []
         for col in data_x.columns:
             if col != self.response_col and col != self.date_col:
-                regressors.append(col)
-        data_x[regressors] = data_x[regressors].astype(float)
-        data_x[self.response_col] = data_x[self.response_col].astype(float)
+                self.regressors.append(col)
+        train_x = data_x[self.regressors].astype(float)
+        train_y = data_x[[self.response_col]].astype(float)
+
+        # reuse the fitted posterior when this coin's data hasn't changed
+        digest = self._digest(np.hstack([train_x, train_y]), dates)
+        if self.coin is not None and self._load_cached(digest):
+            return
 
-        data_x.loc[:, regressors] = self.sc_in.fit_transform(data_x.loc[:, regressors])
-        data_x.loc[:, self.response_col] = self.sc_out.fit_transform(
-            data_x.loc[:, self.response_col].values.reshape(-1, 1))
+        frame = pd.DataFrame(self.sc_in.fit_transform(train_x), columns=self.regressors)
+        frame[self.response_col] = self.sc_out.fit_transform(train_y)[:, 0]
+        frame[self.date_col] = dates
 
         self.model = DLT(
             response_col=self.response_col,
             date_col=self.date_col,
-            regressor_col=regressors,
+            regressor_col=self.regressors,
             estimator=self.estimator,
             seasonality=self.seasonality,
             seed=self.seed,
             global_trend_option=self.global_trend_option,
-            # for prediction uncertainty
-            n_bootstrap_draws=self.n_bootstrap_draws,
+            # prediction intervals are bootstrapped from the residuals in predict()
+            n_bootstrap_draws=-1,
         )
+        self.model.fit(frame)
 
-        self.model.fit(data_x, point_method="mean")
+        fitted = self.model.predict(df=frame)['prediction'].to_numpy()
+        self.residuals = frame[self.response_col].to_numpy() - fitted
+        self.last_date = dates[-1]
+        try:
+            self.freq = pd.infer_freq(dates[-3:]) or 'D'
+        except (TypeError, ValueError):
+            self.freq = 'D'
+        if self.coin is not None:
+            self._save_cached(digest)
 
-    def predict(self, test_x):
-        regressors = []
-        for col in test_x.columns:
-            if col != self.response_col and col != self.date_col:
-                regressors.append(col)
-        test_x[regressors] = test_x[regressors].astype(float)
-
-        test_x.loc[:, regressors] = self.sc_in.transform(test_x.loc[:, regressors])
-        # test_x[self.response_col] = test_x[self.response_col].astype(float)
-        predicted_df = self.model.predict(df=test_x)
-        predicted_df.loc[:, 'prediction'] = self.sc_out.inverse_transform(
-            predicted_df.loc[:, 'prediction'].values.reshape(-1, 1))
-        return np.array(predicted_df.prediction)
\ No newline at end of file
+    def predict(self, test_x, dates=None, return_interval=False):
+        dates = self._dates(test_x, dates)
+        if dates is None:
+            # continue the training timestamps
+            dates = pd.date_range(self.last_date, periods=len(test_x) + 1, freq=self.freq)[1:]
+        frame = pd.DataFrame(self.sc_in.transform(test_x[self.regressors].astype(float)),
+                             columns=self.regressors)
+        frame[self.date_col] = dates
+        predicted = self.model.predict(df=frame)['prediction'].to_numpy()
+        prediction = predicted * self.sc_out.scale_[0]
+        if not return_interval:
+            return prediction
+
+        # residual bootstrap for every draw and step at once: (n_draws, horizon). One-step errors
+        # accumulate along each sampled path, so the interval widens with the horizon
+        draws = self.rng.choice(self.residuals, size=(self.n_bootstrap_draws, len(predicted)))
+        samples = (predicted[None, :] + np.cumsum(draws, axis=1)) * self.sc_out.scale_[0]
+        alpha = 1 - self.confidence_level
+        lower, upper = np.quantile(samples, [alpha / 2, 1 - alpha / 2], axis=0)
+        return prediction, lower, upper
@@ -0,0 +1,231 @@
+import glob
+import hashlib
+import itertools
+import os
+import pickle
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from statsmodels.tsa.arima.model import ARIMA
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.stattools import adfuller, kpss
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "order_search")
+
+
+def data_hash(values):
+    """
+    Hash an array by shape and contents.
+
+    Args:
+        values (np.ndarray): Array to hash.
+
+    Returns:
+        str: Hex digest identifying the array.
+    """
+    values = np.ascontiguousarray(values, dtype=float)
+    digest = hashlib.sha1(str(values.shape).encode())
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def candidate_orders(p_values=(0, 1, 2), d_values=(0, 1), q_values=(0, 1, 2)):
+    """
+    Build a grid of (p, d, q) orders.
+
+    Returns:
+        list: Orders as tuples.
+    """
+    return list(itertools.product(p_values, d_values, q_values))
+
+
+def select_differencing(endog, d_values=(0, 1), alpha=0.05):
+    """
+    Pick the differencing order by unit-root tests.
+
+    The smallest d whose differenced series both rejects a unit root (ADF) and
+    doesn't reject stationarity (KPSS) at level `alpha`; the largest d if none does.
+    Information criteria of models with different d are computed on different
+    series, so d is fixed here and only (p, q) are compared by criterion.
+
+    Args:
+        endog (np.ndarray): Target series.
+        d_values (iterable): Candidate differencing orders.
+        alpha (float): Significance level of both tests.
+
+    Returns:
+        int: Differencing order.
+    """
+    series = np.asarray(endog, dtype=float).ravel()
+    d_values = sorted(set(d_values))
+    for d in d_values:
+        diffed = np.diff(series, n=d) if d else series
+        with warnings.catch_warnings():
+            # kpss warns when its p-value is outside the interpolation table
+            warnings.simplefilter("ignore")
+            adf_p = adfuller(diffed, autolag="AIC")[1]
+            kpss_p = kpss(diffed, regression="c", nlags="auto")[1]
+        if adf_p < alpha and kpss_p >= alpha:
+            return d
+    return d_values[-1]
+
+
+class OrderCache:
+    """
+    On-disk cache of whole order searches.
+
+    One entry holds every candidate's result for a (coin, model kind, search
+    key), where the key covers the data hash and the search settings. At most
+    `max_entries` entries are kept per (coin, kind), the oldest being evicted.
+    The most recent entry also warm starts fits after the data changed.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=5):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, coin, kind):
+        return glob.glob(os.path.join(self.cache_dir, f"{coin}_{kind}_*.pkl"))
+
+    def _path(self, coin, kind, key):
+        return os.path.join(self.cache_dir, f"{coin}_{kind}_{key}.pkl")
+
+    def get(self, coin, kind, key):
+        path = self._path(coin, kind, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def latest(self, coin, kind):
+        paths = self._paths(coin, kind)
+        if not paths:
+            return None
+        with open(max(paths, key=os.path.getmtime), "rb") as f:
+            return pickle.load(f)
+
+    def put(self, coin, kind, key, entry):
+        path = self._path(coin, kind, key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+        for old in sorted(self._paths(coin, kind), key=os.path.getmtime)[:-self.max_entries]:
+            os.remove(old)
+
+
+def _fit_candidate(kind, endog, exog, order, seasonal_order, start_params, maxiter,
+                   enforce_invertibility, enforce_stationarity):
+    # runs in a worker process, so it only returns plain picklable values
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            if kind == "arima":
+                model = ARIMA(endog, exog=exog, order=order)
+                result = model.fit(start_params=start_params, method_kwargs={"maxiter": maxiter})
+            else:
+                model = SARIMAX(endog, exog=exog, order=order, seasonal_order=seasonal_order,
+                                enforce_invertibility=enforce_invertibility,
+                                enforce_stationarity=enforce_stationarity)
+                result = model.fit(start_params=start_params, maxiter=maxiter, disp=False)
+        except Exception as e:
+            return {"order": order, "seasonal_order": seasonal_order, "aic": np.inf, "bic": np.inf,
+                    "params": None, "error": str(e)}
+    return {"order": order, "seasonal_order": seasonal_order, "aic": float(result.aic),
+            "bic": float(result.bic), "params": np.asarray(result.params), "error": None}
+
+
+def select_order(data_x, coin="default", kind="sarimax", orders=None, seasonal_orders=None,
+                 criterion="aic", max_workers=None, cache_dir=DEFAULT_CACHE_DIR,
+                 top_k=None, early_maxiter=10, maxiter=50,
+                 enforce_invertibility=True, enforce_stationarity=True, max_cache_entries=5, d=None):
+    """
+    Pick ARIMA/SARIMAX orders by information criterion over a candidate grid.
+
+    The differencing order is fixed first, by `select_differencing` unless `d`
+    is given, and only candidates with that d are searched: criteria are not
+    comparable across differencing orders.
+
+    By default every candidate is fitted to convergence in a process pool. With
+    `top_k`, candidates are first ranked by a fit of `early_maxiter` iterations
+    and only the `top_k` best are fitted to convergence. This is faster but
+    heuristic: an early criterion is not a bound on the converged one, so a
+    slow-converging candidate can be missed.
+
+    The whole search, including candidates left out by `top_k`, is cached by
+    (coin, data hash, settings), so a re-run on unchanged data is a single
+    cache read. After a data change the fits start from the estimates of the
+    coin's latest search.
+
+    Args:
+        data_x (array-like): Rows laid out as in the model wrappers' `fit`.
+        coin (str): Coin the data belongs to, part of the cache key.
+        kind (str): "sarimax" or "arima".
+        orders (list): Candidate (p, d, q) orders. Defaults to `candidate_orders()`.
+        seasonal_orders (list): Candidate seasonal orders (sarimax only).
+        criterion (str): "aic" or "bic".
+        max_workers (int): Size of the process pool.
+        cache_dir (str): Directory of the search cache.
+        top_k (int): Candidates fitted to convergence after the early ranking, or None for all.
+        early_maxiter (int): Optimizer iterations of the early ranking fits.
+        maxiter (int): Optimizer iterations of the full fits.
+        max_cache_entries (int): Searches kept in the cache per coin and kind.
+        d (int): Differencing order, or None to pick it among the grid's by unit-root tests.
+
+    Returns:
+        tuple: (best order, best seasonal order, list of converged per-candidate
+        results sorted by criterion).
+    """
+    data_x = np.array(data_x)
+    endog = MinMaxScaler().fit_transform(np.array(data_x[:, -1:], dtype=float))
+    exog = MinMaxScaler().fit_transform(np.array(data_x[:, 1:-1], dtype=float))
+    cache = OrderCache(cache_dir, max_cache_entries)
+
+    if orders is None:
+        orders = candidate_orders()
+    if d is None:
+        d = select_differencing(endog, {order[1] for order in orders})
+    orders = [order for order in orders if order[1] == d]
+    if not orders:
+        raise ValueError(f"No candidate order has d={d}")
+    if kind == "arima" or not seasonal_orders:
+        seasonal_orders = [None] if kind == "arima" else [(0, 0, 0, 0)]
+    candidates = [(tuple(order), tuple(seasonal) if seasonal else seasonal)
+                  for order in orders for seasonal in seasonal_orders]
+    settings = repr((candidates, criterion, top_k, early_maxiter, maxiter, enforce_invertibility,
+                     enforce_stationarity))
+    key = hashlib.sha1(f"{data_hash(data_x)}:{settings}".encode()).hexdigest()
+
+    entry = cache.get(coin, kind, key)
+    if entry is None:
+        previous = cache.latest(coin, kind)
+        warm = {(r["order"], r["seasonal_order"]): r["params"] for r in previous["results"]} if previous else {}
+        jobs = [(order, seasonal, warm.get((order, seasonal))) for order, seasonal in candidates]
+
+        def run(jobs, iterations):
+            if not jobs:
+                return []
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_fit_candidate, kind, endog, exog, order, seasonal, start_params,
+                                       iterations, enforce_invertibility, enforce_stationarity)
+                           for order, seasonal, start_params in jobs]
+                return [future.result() for future in futures]
+
+        skipped = []
+        if top_k is not None and top_k < len(jobs):
+            early = sorted(run(jobs, early_maxiter), key=lambda r: r[criterion])
+            jobs = [(r["order"], r["seasonal_order"], r["params"]) for r in early[:top_k]]
+            # kept with their early estimates, for warm starts only
+            skipped = [dict(r, converged=False) for r in early[top_k:]]
+        results = [dict(r, converged=True) for r in run(jobs, maxiter)] + skipped
+        entry = {"results": results}
+        cache.put(coin, kind, key, entry)
+
+    results = [r for r in entry["results"] if r["converged"] and r["error"] is None]
+    if not results:
+        raise ValueError(f"No candidate order could be fitted for {coin}")
+    results.sort(key=lambda r: r[criterion])
+    return results[0]["order"], results[0]["seasonal_order"], results
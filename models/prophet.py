@@ -2,13 +2,33 @@
 from prophet import Prophet
 import numpy as np
 
+from .telemetry import recorded
+
+# per-process cache of the last fitted parameters of each coin, used to warm start the next fit
+_warm_params = {}
+
+
+def stan_init(model):
+    # fitted parameters of a Prophet model in the form Prophet.fit(init=...) expects
+    res = {}
+    for pname in ['k', 'm', 'sigma_obs']:
+        res[pname] = model.params[pname][0][0]
+    for pname in ['delta', 'beta']:
+        res[pname] = model.params[pname][0]
+    return res
+
 
 class MyProphet:
 
     def __init__(self, args):
         self.response_col = args.response_col
         self.date_col = args.date_col
+        self.coin = getattr(args, 'coin', None)
+        self.warm_start = getattr(args, 'warm_start', False)
+        # optimizer iteration cap for warm-started fits
+        self.warm_max_iter = getattr(args, 'warm_max_iter', 1000)
 
+    @recorded('prophet')
     def fit(self, data_x):
         self.model_fbp = Prophet()
         self.regressors = []
@@ -21,7 +41,13 @@ class MyProphet:
         data_x[self.response_col] = data_x[self.response_col].astype(float)
         ml_df1 = data_x.reset_index().rename(columns={self.date_col: 'ds', self.response_col: 'y'})
         # print(train_x)
-        self.model_fbp.fit(ml_df1)
+        fit_kwargs = {}
+        if self.warm_start and self.coin in _warm_params:
+            # Prophet falls back to its default init for any parameter whose shape changed
+            fit_kwargs = {'init': _warm_params[self.coin], 'iter': self.warm_max_iter}
+        self.model_fbp.fit(ml_df1, **fit_kwargs)
+        if self.warm_start:
+            _warm_params[self.coin] = stan_init(self.model_fbp)
 
     def predict(self, test_x):
         test_x[self.regressors] = test_x[self.regressors].astype(float)
@@ -2,24 +2,31 @@
 from sklearn.ensemble import RandomForestRegressor
 import numpy as np
 
+from .forest_engine import CompiledForest
+from .telemetry import recorded
+
 
 class RandomForest:
 
     def __init__(self, args):
         self.n_estimators = args.n_estimators
         self.random_state = args.random_state
+        self.coin = getattr(args, 'coin', None)
         self.model = RandomForestRegressor(n_estimators=self.n_estimators, random_state=self.random_state)
 
+    @recorded('random_forest', iterative=False)
     def fit(self, data_x):
         data_x = np.array(data_x)
         train_x = data_x[:, 1:-1]
         train_y = data_x[:, -1]
         # print(train_x)
         self.model.fit(train_x, train_y)
+        # flat node arrays for fast small-batch inference
+        self.engine = CompiledForest.from_sklearn(self.model)
 
     def predict(self, test_x):
         test_x = np.array(test_x.iloc[:, 1:], dtype=float)
-        pred_y = self.model.predict(test_x)
+        pred_y = self.engine.predict(test_x)
         return pred_y
 
 
@@ -0,0 +1,13 @@
+def parse_order(order):
+    """
+    Parse an ARIMA/SARIMAX order given either as "1, 1, 1" or as a tuple.
+
+    Args:
+        order (str | tuple): Order as stored in the model arguments.
+
+    Returns:
+        tuple: The order as a tuple of ints.
+    """
+    if isinstance(order, str):
+        return tuple(int(x) for x in order.split(','))
+    return tuple(int(x) for x in order)
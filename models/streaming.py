@@ -0,0 +1,133 @@
+import json
+import math
+import os
+
+import keras
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class BarStore:
+    """
+    Append-only, memory-mapped store of numeric bars (one row per bar).
+
+    Rows are kept as raw float64 in `<path>.bin` with the column names in
+    `<path>.json`. Readers map the file instead of loading it, so only the pages
+    touched by a batch are brought into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(f"{path}.json") as f:
+            self.columns = json.load(f)["columns"]
+
+    @classmethod
+    def create(cls, path, columns):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.json", "w") as f:
+            json.dump({"columns": list(columns)}, f)
+        open(f"{path}.bin", "wb").close()
+        return cls(path)
+
+    @classmethod
+    def from_csv(cls, csv_path, path, columns, chunksize=100000):
+        """
+        Build a store from a CSV without loading it whole.
+
+        Args:
+            csv_path (str): Source CSV, sorted by time.
+            path (str): Store path prefix.
+            columns (list): Numeric columns to keep, 'Price' first.
+            chunksize (int): Rows parsed per chunk.
+        """
+        import pandas as pd
+
+        store = cls.create(path, columns)
+        for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+            chunk = chunk[columns].apply(pd.to_numeric, errors="coerce").dropna()
+            store.append(chunk.to_numpy(dtype=float))
+        return store
+
+    def append(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=np.float64)
+        with open(f"{self.path}.bin", "ab") as f:
+            f.write(rows.tobytes())
+
+    @property
+    def bars(self):
+        size = os.path.getsize(f"{self.path}.bin")
+        if size == 0:
+            return np.empty((0, len(self.columns)))
+        return np.memmap(f"{self.path}.bin", dtype=np.float64, mode="r").reshape(-1, len(self.columns))
+
+    def __len__(self):
+        return os.path.getsize(f"{self.path}.bin") // (8 * len(self.columns))
+
+    def column_range(self, chunk_rows=1000000):
+        """
+        Per-column min and max, computed chunk by chunk.
+        """
+        bars = self.bars
+        low = np.full(bars.shape[1], np.inf)
+        high = np.full(bars.shape[1], -np.inf)
+        for start in range(0, len(bars), chunk_rows):
+            chunk = np.asarray(bars[start:start + chunk_rows])
+            low = np.minimum(low, chunk.min(axis=0))
+            high = np.maximum(high, chunk.max(axis=0))
+        return low, high
+
+
+def window_range(low, high, look_back):
+    """
+    Expand per-column bar bounds to the features of a flattened window.
+
+    A flattened window repeats the bar columns `look_back` times; the first
+    value (the oldest price) is dropped, as the wrappers' fit does.
+
+    Args:
+        low (np.ndarray): Per-column minimum, e.g. from BarStore.column_range.
+        high (np.ndarray): Per-column maximum.
+        look_back (int): Bars per window.
+
+    Returns:
+        tuple: (low, high) arrays of length look_back * n_columns - 1.
+    """
+    return np.tile(low, look_back)[1:], np.tile(high, look_back)[1:]
+
+
+class WindowSequence(keras.utils.PyDataset):
+    """
+    Batches of scaled look-back windows generated on the fly from a BarStore.
+
+    Batch i covers windows [start + i * batch_size, ...). Each batch reads only
+    its own `batch_size + look_back` bars from the memory map, so peak memory
+    depends on the batch size, not the history length. Batches are prefetched
+    by Keras' PyDataset workers.
+    """
+
+    def __init__(self, store, look_back, batch_size, sc_in, sc_out, start=0, stop=None,
+                 workers=2, max_queue_size=8):
+        super().__init__(workers=workers, use_multiprocessing=False, max_queue_size=max_queue_size)
+        self.store = store
+        self.look_back = look_back
+        self.batch_size = batch_size
+        self.sc_in = sc_in
+        self.sc_out = sc_out
+        n_windows = len(store) - look_back
+        self.start = start
+        self.stop = n_windows if stop is None else min(stop, n_windows)
+
+    def __len__(self):
+        return math.ceil(max(self.stop - self.start, 0) / self.batch_size)
+
+    def __getitem__(self, index):
+        first = self.start + index * self.batch_size
+        last = min(first + self.batch_size, self.stop)
+        bars = np.asarray(self.store.bars[first:last + self.look_back])
+        windows = sliding_window_view(bars, self.look_back, axis=0)[:last - first].transpose(0, 2, 1)
+        batch_x = windows.reshape(last - first, -1)[:, 1:]
+        batch_y = bars[self.look_back:self.look_back + last - first, :1]
+        batch_x = self.sc_in.transform(batch_x)
+        batch_y = self.sc_out.transform(batch_y)
+        batch_x = np.reshape(batch_x, (batch_x.shape[0], 1, batch_x.shape[1]))
+        return batch_x.astype(np.float32), batch_y.astype(np.float32)
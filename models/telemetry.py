@@ -0,0 +1,257 @@
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# JSON lines file the training runs are appended to; set TRAINING_TELEMETRY="" to turn recording off
+TELEMETRY_PATH = os.environ.get("TRAINING_TELEMETRY", os.path.join(".cache", "telemetry", "training.jsonl"))
+
+_current_run = contextvars.ContextVar("training_run", default=None)
+_write_lock = threading.Lock()
+# stage(name, coin, model) context manager factory the wrappers time their stages with, if any
+_stage_timer = None
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None where unavailable).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb():
+    """
+    Current resident set size of this process in MB, from /proc (None where unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class _RSSSampler(threading.Thread):
+    # highest current RSS seen while a run is recorded
+
+    def __init__(self, interval=0.05):
+        super().__init__(name="telemetry-rss", daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb() or 0.0)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_mb() or 0.0)
+        return self.peak
+
+
+def describe_data(data):
+    """
+    Content hash and row count of a fit's training data.
+
+    Args:
+        data: np.ndarray, pd.DataFrame, dict of those (coin -> rows), or a BarStore.
+
+    Returns:
+        tuple: (sha1 hex digest, number of rows).
+    """
+    digest = hashlib.sha1()
+    rows = 0
+    if isinstance(data, dict):
+        for key in sorted(data):
+            sub_digest, sub_rows = describe_data(data[key])
+            digest.update(f"{key}:{sub_digest}".encode())
+            rows += sub_rows
+    elif isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+        rows = len(data)
+    elif hasattr(data, "bars"):
+        # BarStore: the file is append-only, so its path and length identify the content
+        rows = len(data)
+        digest.update(f"{os.path.abspath(data.path)}:{rows}".encode())
+    else:
+        values = np.ascontiguousarray(data)
+        digest.update(repr(values.shape).encode())
+        digest.update(values.tobytes())
+        rows = values.shape[0] if values.ndim else 1
+    return digest.hexdigest(), rows
+
+
+def current_run():
+    """
+    The TrainingRun being recorded in this context, or None.
+    """
+    return _current_run.get()
+
+
+class TrainingRun:
+    """
+    Wall time, throughput, memory and per-epoch timing of one fit.
+
+    Iterative trainers report epochs (or boosting rounds) through `epoch`; the
+    Keras wrappers do so with keras_utils.EpochTelemetry. Records of
+    non-iterative trainers have no "epochs" field.
+
+    `peak_rss_growth_mb` is the highest RSS sampled during the fit minus the
+    RSS at its start. It covers the whole process, so fits running
+    concurrently in one process share it; it is None where /proc is missing.
+    """
+
+    def __init__(self, model, coin, method, data, iterative=True):
+        self.model = model
+        self.iterative = iterative
+        self.coin = coin
+        self.method = method
+        self.data_hash, self.rows = describe_data(data)
+        self.epochs = []
+        self.samples = 0
+        self.record = None
+
+    def epoch(self, index, seconds, samples=None, **metrics):
+        entry = {"epoch": index, "seconds": seconds}
+        if samples:
+            self.samples += samples
+            entry["samples_per_sec"] = samples / seconds if seconds > 0 else None
+        entry.update({name: float(value) for name, value in metrics.items()})
+        self.epochs.append(entry)
+
+    def __enter__(self):
+        self._token = _current_run.set(self)
+        self._rss_start = current_rss_mb()
+        self._rss_sampler = _RSSSampler() if self._rss_start is not None else None
+        if self._rss_sampler is not None:
+            self._rss_sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        _current_run.reset(self._token)
+        rss_peak = self._rss_sampler.stop() if self._rss_sampler is not None else None
+        # rows passed over by all epochs; one pass for non-iterative fits
+        samples = self.samples or self.rows
+        self.record = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "model": self.model,
+            "coin": self.coin,
+            "method": self.method,
+            "data_hash": self.data_hash,
+            "rows": self.rows,
+            "wall_seconds": seconds,
+            "samples_per_sec": samples / seconds if seconds > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_growth_mb": rss_peak - self._rss_start if rss_peak is not None else None,
+            "status": "ok" if exc_type is None else "error",
+            "error": None if exc is None else repr(exc),
+        }
+        if self.iterative:
+            self.record["epochs"] = self.epochs
+        write_record(self.record)
+        return False
+
+
+def write_record(record, path=None):
+    path = TELEMETRY_PATH if path is None else path
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        line = json.dumps(record, default=str)
+        with _write_lock, open(path, "a") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logging.warning(f"Could not write training telemetry to {path}: {e}")
+
+
+def set_stage_timer(timer):
+    """
+    Route the wrappers' stage timings to `timer`, e.g. instrumentation.stage.
+
+    The models package doesn't depend on the serving instrumentation; whoever
+    serves the models plugs its timer in here. Without one, stages aren't timed.
+
+    Args:
+        timer (callable): timer(name, coin, model) returning a context manager, or None.
+    """
+    global _stage_timer
+    _stage_timer = timer
+
+
+def stage(name, coin="", model=""):
+    """
+    Time a block with the timer set by set_stage_timer (a no-op without one).
+    """
+    timer = _stage_timer
+    return timer(name, coin, model) if timer is not None else contextlib.nullcontext()
+
+
+def recorded(model, iterative=True):
+    """
+    Decorate a wrapper's fit (or update) method so every call is recorded as a TrainingRun.
+
+    Calls made while a run is already being recorded (e.g. partial_fit falling
+    back to fit) are part of that run and not recorded twice. The fitted
+    instance keeps the record in `self.telemetry`.
+
+    Args:
+        model (str): Model name, as in models.MODELS.
+        iterative (bool): Whether the model trains in epochs or rounds; False leaves
+            the per-epoch fields out of its records.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, data, *args, **kwargs):
+            if _current_run.get() is not None:
+                return method(self, data, *args, **kwargs)
+            coin = ",".join(sorted(data)) if isinstance(data, dict) else getattr(self, "coin", None)
+            run = TrainingRun(model, coin or None, method.__name__, data, iterative)
+            try:
+                with run:
+                    return method(self, data, *args, **kwargs)
+            finally:
+                self.telemetry = run.record
+        return wrapper
+    return decorator
+
+
+def load_runs(path=None):
+    """
+    Recorded training runs as a DataFrame, one row per run.
+
+    Example:
+        runs = load_runs()
+        runs.groupby(['model', 'coin'])['wall_seconds'].describe()
+    """
+    path = TELEMETRY_PATH if path is None else path
+    if not path or not os.path.exists(path):
+        return pd.DataFrame()
+    runs = pd.read_json(path, lines=True)
+    if "time" in runs:
+        runs["time"] = pd.to_datetime(runs["time"])
+    return runs
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import TimeSeriesSplit
+
+DEFAULT_PARAMS_DIR = os.path.join(".cache", "xgb_params")
+
+SEARCH_SPACE = {
+    "learning_rate": [0.05, 0.10, 0.20, 0.30],
+    "max_depth": [1, 3, 4, 5, 6, 7],
+    "min_child_weight": [int(x) for x in np.arange(3, 10, 1)],
+    "gamma": [0.0, 0.2, 0.4, 0.6],
+    "subsample": [0.5, 0.6, 0.7, 0.8, 0.9, 1],
+    "colsample_bytree": [0.5, 0.7, 0.9, 1],
+    "colsample_bylevel": [0.5, 0.7, 0.9, 1],
+}
+
+
+def params_path(coin, params_dir=DEFAULT_PARAMS_DIR):
+    return os.path.join(params_dir, f"xgboost_{coin}.json")
+
+
+def load_params(coin, params_dir=DEFAULT_PARAMS_DIR):
+    """
+    Load the persisted winning parameters for a coin.
+
+    Returns:
+        dict: XGBRegressor parameters, or None if no search has been saved.
+    """
+    path = params_path(coin, params_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_params(coin, params, params_dir=DEFAULT_PARAMS_DIR):
+    os.makedirs(params_dir, exist_ok=True)
+    with open(params_path(coin, params_dir), "w") as f:
+        json.dump(params, f, indent=2)
+
+
+def halving_search(train_x, train_y, n_candidates=27, n_splits=3, min_rounds=50, max_rounds=1000,
+                   eta=3, early_stopping_rounds=20, time_budget=300.0, n_jobs=2, max_bin=256,
+                   random_state=42):
+    """
+    Successive-halving search over XGBoost parameters with time-ordered folds.
+
+    Each fold's training and validation matrices are quantized once and reused
+    by every candidate. Candidates start with `min_rounds` boosting rounds and
+    the best 1/`eta` of them move on with `eta` times more rounds, up to
+    `max_rounds`. Every fit stops early on its validation fold, and the search
+    returns the best candidate seen so far once `time_budget` seconds are spent.
+
+    Args:
+        train_x (np.ndarray): Features in time order.
+        train_y (np.ndarray): Targets in time order.
+        n_candidates (int): Number of sampled parameter sets in the first rung.
+        n_splits (int): Number of expanding-window folds.
+        n_jobs (int): Threads used by each XGBoost fit.
+
+    Returns:
+        dict: XGBRegressor parameters including `n_estimators`.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(random_state)
+    train_x = np.asarray(train_x, dtype=np.float32)
+    train_y = np.asarray(train_y, dtype=np.float32)
+
+    folds = []
+    for train_idx, valid_idx in TimeSeriesSplit(n_splits=n_splits).split(train_x):
+        dtrain = xgb.QuantileDMatrix(train_x[train_idx], train_y[train_idx], max_bin=max_bin)
+        dvalid = xgb.QuantileDMatrix(train_x[valid_idx], train_y[valid_idx], ref=dtrain)
+        folds.append((dtrain, dvalid))
+
+    candidates = [{key: values[rng.integers(len(values))] for key, values in SEARCH_SPACE.items()}
+                  for _ in range(n_candidates)]
+    candidates = [{key: (value.item() if hasattr(value, "item") else value) for key, value in c.items()}
+                  for c in candidates]
+
+    best = None
+    rounds = min_rounds
+    while candidates:
+        scored = []
+        for params in candidates:
+            if best is not None and time.perf_counter() - start > time_budget:
+                break
+            booster_params = dict(params, objective="reg:squarederror", tree_method="hist",
+                                  max_bin=max_bin, nthread=n_jobs, seed=random_state)
+            scores = []
+            iterations = []
+            for dtrain, dvalid in folds:
+                booster = xgb.train(booster_params, dtrain, num_boost_round=rounds,
+                                    evals=[(dvalid, "valid")],
+                                    early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+                scores.append(booster.best_score)
+                iterations.append(booster.best_iteration + 1)
+            result = (float(np.mean(scores)), params, int(np.mean(iterations)))
+            scored.append(result)
+            if best is None or result[0] < best[0]:
+                best = result
+
+        out_of_time = time.perf_counter() - start > time_budget
+        if out_of_time or rounds >= max_rounds or len(scored) <= 1:
+            break
+        scored.sort(key=lambda r: r[0])
+        candidates = [params for _, params, _ in scored[:max(1, len(scored) // eta)]]
+        rounds = min(rounds * eta, max_rounds)
+
+    _, params, n_estimators = best
+    return dict(params, n_estimators=n_estimators, max_bin=max_bin)
@@ -1,9 +1,32 @@
 # Import the model we are using
+import time
+
 import xgboost as xgb
 from sklearn.model_selection import RandomizedSearchCV
 import numpy as np
 import pandas as pd
 
+from . import xgb_search
+from .telemetry import current_run, recorded
+
+
+class _RoundTelemetry(xgb.callback.TrainingCallback):
+    # per boosting round timing for the recorded training run
+
+    def __init__(self, samples):
+        super().__init__()
+        self.samples = samples
+
+    def before_iteration(self, model, epoch, evals_log):
+        self.start = time.perf_counter()
+        return False
+
+    def after_iteration(self, model, epoch, evals_log):
+        run = current_run()
+        if run is not None:
+            run.epoch(epoch, time.perf_counter() - self.start, self.samples)
+        return False
+
 
 class MyXGboost:
 
@@ -23,14 +46,33 @@ class MyXGboost:
                 self.reg,
                 param_distributions=self.params,
                 n_iter=20,
-                n_jobs=-1,
+                # all cores unless the caller caps them (train_matrix passes its per-job thread cap)
+                n_jobs=getattr(args, 'n_jobs', -1),
                 cv=5,
+                # fixed seed, so the same candidates are tried on every run
+                random_state=getattr(args, 'random_state', None),
                 verbose=3,
                 )
         self.response_col = args.response_col
         self.date_col = args.date_col
+        # "random" keeps RandomizedSearchCV, "halving" runs the budgeted time-series search
+        self.search_mode = getattr(args, 'search_mode', 'random')
+        self.coin = getattr(args, 'coin', None)
+        self.search_time_budget = getattr(args, 'search_time_budget', 300.0)
+        self.n_jobs = getattr(args, 'n_jobs', 2)
+        self.params_dir = getattr(args, 'params_dir', xgb_search.DEFAULT_PARAMS_DIR)
 
+    @recorded('xgboost')
     def fit(self, data_x):
+        """
+        Search the hyperparameters and fit on data_x.
+
+        Training telemetry has per-round timings only in "halving" mode, from
+        the final refit. In "random" mode the fits run inside
+        RandomizedSearchCV's cross-validation (in joblib workers when
+        n_jobs != 1), so the record holds the wall time and throughput of the
+        whole search but no `epochs`.
+        """
         self.regressors = []
         for col in data_x.columns:
             if col != self.response_col and col != self.date_col:
@@ -39,7 +81,23 @@ class MyXGboost:
         train_y = pd.DataFrame()
         train_x[self.regressors] = data_x[self.regressors].astype(float)
         train_y[self.response_col] = data_x[self.response_col].astype(float)
-        self.model_xg.fit(train_x,train_y)
+        if self.search_mode == 'halving':
+            self.fit_searched(train_x, train_y)
+        else:
+            self.model_xg.fit(train_x,train_y)
+
+    def fit_searched(self, train_x, train_y):
+        # reuse the parameters persisted for this coin, searching only when there are none
+        params = xgb_search.load_params(self.coin, self.params_dir) if self.coin else None
+        if params is None:
+            params = xgb_search.halving_search(
+                train_x.values, train_y.values.ravel(),
+                time_budget=self.search_time_budget, n_jobs=self.n_jobs)
+            if self.coin:
+                xgb_search.save_params(self.coin, params, self.params_dir)
+        self.model_xg = xgb.XGBRegressor(tree_method='hist', n_jobs=self.n_jobs,
+                                         callbacks=[_RoundTelemetry(len(train_x))], **params)
+        self.model_xg.fit(train_x, train_y)
 
     def predict(self, test_x):
         valid_x = pd.DataFrame()
@@ -18,7 +18,7 @@ class Orbit:
         self.global_trend_option = args.global_trend_option
         self.n_bootstrap_draws = args.n_bootstrap_draws
 
-    def fit(self, data_x):
+    def fit(self, data_x, dates=None):
         # Convert NumPy array to DataFrame
         num_features = data_x.shape[1] - 1  # Exclude target column
         columns = [f"feature_{i}" for i in range(num_features)] + [self.response_col]
@@ -26,9 +26,15 @@ class Orbit:
 
         print(f"Training Data Shape: {data_x.shape}")  # Debugging step
 
-        # Add date column (if not present) and set the correct column name
-        data_x[self.date_col] = pd.date_range(start="2020-01-01", periods=len(data_x), freq="D")  # Assuming daily frequency
-        data_x[self.date_col] = pd.to_datetime(data_x[self.date_col])  # Ensure datetime format
+        # DLT's trend and seasonality are fitted on the timestamps, so they must be the real ones from load_data
+        if dates is None:
+            raise ValueError("Orbit needs the dates of the training rows, e.g. load_data's 'Date' column")
+        data_x[self.date_col] = pd.to_datetime(np.asarray(dates))
+        self.last_date = data_x[self.date_col].iloc[-1]
+        try:
+            self.freq = pd.infer_freq(data_x[self.date_col].iloc[-3:]) or "D"
+        except (TypeError, ValueError):
+            self.freq = "D"
 
         regressors = []
         for col in data_x.columns:
@@ -60,15 +66,17 @@ class Orbit:
         # Remove point_method="mean" from the fit method
         self.model.fit(data_x)
 
-    def predict(self, test_x):
+    def predict(self, test_x, dates=None):
         # Convert NumPy array to DataFrame
         num_features = test_x.shape[1] - 1  # Exclude target column
         columns = [f"feature_{i}" for i in range(num_features)] + [self.response_col]
         test_x = pd.DataFrame(test_x, columns=columns)
 
-        # Add the same date column to test data (ensure the model receives it)
-        test_x[self.date_col] = pd.date_range(start="2021-01-01", periods=len(test_x), freq="D")  # Fake dates for prediction
-        test_x[self.date_col] = pd.to_datetime(test_x[self.date_col])  # Ensure datetime format
+        # Use the given dates, otherwise continue the training timestamps
+        if dates is not None:
+            test_x[self.date_col] = pd.to_datetime(np.asarray(dates))
+        else:
+            test_x[self.date_col] = pd.date_range(self.last_date, periods=len(test_x) + 1, freq=self.freq)[1:]
 
         # Ensure that test data has the same columns as training data
         missing_columns = set(self.sc_in.feature_names_in_) - set(test_x.columns)
@@ -0,0 +1,298 @@
+"""
+Memoized training pipeline: load -> clean -> resample -> window -> scale -> fit -> evaluate.
+
+Every stage output is cached on disk under a key derived from the stage name,
+its parameters and the content hashes of its inputs' outputs. A run only
+executes the stages whose key changed, so switching the model re-runs fit and
+evaluate, and a coin whose data and settings are unchanged is not touched.
+
+Example:
+    python pipeline.py --coins BTC ETH SOL --models lstm random_forest
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+from argparse import Namespace
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from dataset import DATA_DIR, NUMERIC_COLUMNS, data_path, prepare_data, window_columns
+from train_matrix import DATE_MODELS, DEFAULT_MODEL_ARGS
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "pipeline")
+
+
+def params_digest(params):
+    # short stable hash of stage parameters, for stage names
+    encoded = json.dumps(params, sort_keys=True, default=repr).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def file_fingerprint(path):
+    # content hash of a source file, so edits invalidate the stages reading it
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Stage:
+
+    def __init__(self, name, func, inputs=(), params=None, fingerprint=None, version=1):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        # callable returning a hash of external inputs (e.g. a CSV file)
+        self.fingerprint = fingerprint
+        self.version = version
+
+
+class Pipeline:
+    """
+    DAG of stages with a content-addressed on-disk cache.
+
+    Stage outputs are pickled to `<cache_dir>/<key>.pkl` next to a manifest
+    holding the hash of the pickled output. Downstream keys use that output
+    hash, so a stage whose inputs are recomputed but come out identical still
+    hits the cache. Outputs are only unpickled when a downstream stage has to
+    execute or the caller asks for them.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.stages = {}
+        self._resolved = {}
+        self._outputs = {}
+        self.executed = []
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def add(self, name, func, inputs=(), params=None, fingerprint=None, version=1):
+        # stages are shared by name, so pipelines for several models reuse the same data stages
+        stage = Stage(name, func, inputs, params, fingerprint, version)
+        existing = self.stages.get(name)
+        if existing is None:
+            self.stages[name] = stage
+        elif self._definition(existing) != self._definition(stage):
+            raise ValueError(f"Stage {name} is already defined with a different function, inputs or params")
+        return name
+
+    @staticmethod
+    def _definition(stage):
+        return (f"{stage.func.__module__}.{stage.func.__qualname__}", stage.inputs, stage.version,
+                json.dumps(stage.params, sort_keys=True, default=repr))
+
+    def _key(self, stage, input_hashes):
+        payload = {
+            "name": stage.name,
+            "func": f"{stage.func.__module__}.{stage.func.__qualname__}",
+            "version": stage.version,
+            "params": stage.params,
+            "inputs": input_hashes,
+            "fingerprint": stage.fingerprint() if stage.fingerprint else None,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=repr).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.pkl", f"{base}.json"
+
+    def _resolve(self, name):
+        # returns (key, output hash), executing the stage only on a cache miss
+        if name in self._resolved:
+            return self._resolved[name]
+        stage = self.stages[name]
+        input_hashes = [self._resolve(inp)[1] for inp in stage.inputs]
+        key = self._key(stage, input_hashes)
+        output_path, manifest_path = self._paths(key)
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                output_hash = json.load(f)["output_hash"]
+        else:
+            output_hash = self._execute(name, key)
+            with open(f"{manifest_path}.tmp", "w") as f:
+                json.dump({"stage": name, "output_hash": output_hash}, f)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        self._resolved[name] = (key, output_hash)
+        return key, output_hash
+
+    def _execute(self, name, key):
+        stage = self.stages[name]
+        values = [self.output(inp) for inp in stage.inputs]
+        logging.info(f"Running stage {name}")
+        output = stage.func(*values, **stage.params)
+        self.executed.append(name)
+        self._outputs[name] = output
+        try:
+            blob = pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # unpicklable outputs (e.g. some framework models) are kept in memory only and
+            # recomputed if a later run needs them; downstream stages still use the cache
+            logging.warning(f"Stage {name} output is not cacheable: {e}")
+            return f"uncached-{key}"
+        output_path = self._paths(key)[0]
+        with open(f"{output_path}.tmp", "wb") as f:
+            f.write(blob)
+        os.replace(f"{output_path}.tmp", output_path)
+        return hashlib.sha256(blob).hexdigest()
+
+    def output(self, name):
+        """
+        Return a stage's output, computing or loading it as needed.
+        """
+        key, _ = self._resolve(name)
+        if name not in self._outputs:
+            output_path = self._paths(key)[0]
+            if os.path.exists(output_path):
+                with open(output_path, "rb") as f:
+                    self._outputs[name] = pickle.load(f)
+            else:
+                self._execute(name, key)
+        return self._outputs[name]
+
+    def run(self, targets):
+        """
+        Resolve the target stages and return their outputs.
+
+        Args:
+            targets (list): Stage names.
+
+        Returns:
+            dict: Stage name to output.
+        """
+        return {name: self.output(name) for name in targets}
+
+
+# stage functions
+
+def load_stage(path):
+    return pd.read_csv(path)
+
+
+def clean_stage(df):
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df.dropna(subset=['Date'], inplace=True)
+    df = df.sort_values(by='Date')
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.dropna(subset=NUMERIC_COLUMNS, inplace=True)
+    return df.reset_index(drop=True)
+
+
+def resample_stage(df, rule=None):
+    if rule is None:
+        return df
+    aggregations = {'Price': 'last', 'Open': 'first', 'High': 'max', 'Low': 'min',
+                    'Vol.': 'sum', 'Change %': 'last'}
+    resampled = df.set_index('Date').resample(rule).agg(aggregations).dropna()
+    return resampled.reset_index()[['Date'] + NUMERIC_COLUMNS]
+
+
+def window_stage(df, look_back=5, horizon=1):
+    windows = prepare_data(df[['Date'] + NUMERIC_COLUMNS], look_back, horizon)
+    frame = pd.DataFrame(windows, columns=window_columns(windows.shape[1]))
+    frame.insert(0, 'Date', df['Date'].to_numpy()[look_back + horizon - 1:][:len(frame)])
+    return frame
+
+
+def scale_stage(frame, test_size=0.2):
+    # scalers are fitted on the training split only
+    split_index = int(len(frame) * (1 - test_size))
+    numeric = [col for col in frame.columns if col != 'Date']
+    features = [col for col in numeric if col != 'Price']
+    sc_in = MinMaxScaler().fit(frame[features].iloc[:split_index])
+    sc_out = MinMaxScaler().fit(frame[['Price']].iloc[:split_index])
+    scaled = frame.copy()
+    scaled[features] = sc_in.transform(frame[features])
+    scaled['Price'] = sc_out.transform(frame[['Price']])[:, 0]
+    return {'train': scaled.iloc[:split_index].reset_index(drop=True),
+            'test': scaled.iloc[split_index:].reset_index(drop=True),
+            'sc_out': sc_out}
+
+
+def fit_stage(scaled, model_name, model_args):
+    from models import MODELS
+
+    train_df = scaled['train']
+    if model_name not in DATE_MODELS:
+        train_df = train_df.drop(columns=['Date'])
+    model = MODELS[model_name](Namespace(**model_args))
+    model.fit(train_df.copy())
+    return model
+
+
+def evaluate_stage(scaled, model, model_name):
+    test_df = scaled['test'].drop(columns=['Price'])
+    if model_name not in DATE_MODELS:
+        test_df = test_df.drop(columns=['Date'])
+    predicted = np.asarray(model.predict(test_df.copy()), dtype=float).reshape(-1, 1)
+    predicted = scaled['sc_out'].inverse_transform(predicted)[:, 0]
+    actual = scaled['sc_out'].inverse_transform(scaled['test'][['Price']])[:, 0]
+    errors = actual - predicted
+    return {
+        'mae': float(np.mean(np.abs(errors))),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'r2': float(1 - np.sum(errors ** 2) / np.sum((actual - actual.mean()) ** 2)),
+        'predictions': pd.DataFrame({'Actual Price': actual, 'Predicted Price': predicted}),
+    }
+
+
+def build_training_pipeline(pipeline, coin, model_name, model_args=None, look_back=5, horizon=1,
+                            resample=None, test_size=0.2, data_dir=DATA_DIR):
+    """
+    Add the stages for one (coin, model) training run.
+
+    Returns:
+        str: Name of the evaluate stage.
+    """
+    path = data_path(coin, data_dir)
+    args = dict(DEFAULT_MODEL_ARGS, coin=coin)
+    args.update(model_args or {})
+
+    raw = pipeline.add(f"{coin}/load", load_stage, params={'path': path},
+                       fingerprint=lambda: file_fingerprint(path))
+    clean = pipeline.add(f"{coin}/clean", clean_stage, [raw])
+    resampled = pipeline.add(f"{coin}/resample/{resample}", resample_stage, [clean], {'rule': resample})
+    windows = pipeline.add(f"{coin}/window/{look_back}/{horizon}", window_stage, [resampled],
+                           {'look_back': look_back, 'horizon': horizon})
+    scaled = pipeline.add(f"{windows}/scale/{test_size}", scale_stage, [windows], {'test_size': test_size})
+    fitted = pipeline.add(f"{scaled}/fit/{model_name}/{params_digest(args)}", fit_stage, [scaled],
+                          {'model_name': model_name, 'model_args': args})
+    return pipeline.add(f"{fitted}/evaluate", evaluate_stage, [scaled, fitted], {'model_name': model_name})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run the memoized training pipeline")
+    parser.add_argument("--coins", nargs="+", default=["BTC", "ETH", "SOL"])
+    parser.add_argument("--models", nargs="+", default=["lstm"])
+    parser.add_argument("--look-back", type=int, default=5)
+    parser.add_argument("--horizon", type=int, default=1)
+    parser.add_argument("--resample", default=None)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    cli = parser.parse_args()
+
+    pipe = Pipeline(cli.cache_dir)
+    targets = {}
+    for coin in cli.coins:
+        for model_name in cli.models:
+            targets[(coin, model_name)] = build_training_pipeline(
+                pipe, coin, model_name, look_back=cli.look_back, horizon=cli.horizon,
+                resample=cli.resample, data_dir=cli.data_dir)
+
+    results = pipe.run(list(targets.values()))
+    for (coin, model_name), target in targets.items():
+        metrics = results[target]
+        print(f"{model_name} {coin}: MAE {metrics['mae']:.4f} RMSE {metrics['rmse']:.4f} R2 {metrics['r2']:.4f}")
+    print(f"Stages executed: {len(pipe.executed)} of {len(pipe.stages)}")
@@ -0,0 +1,200 @@
+"""
+On-demand profiling of single API requests.
+
+A request is profiled when it carries the admin header (`X-Profile` set to
+PROFILE_ADMIN_TOKEN) or is picked by the PROFILE_SAMPLE_RATE sampling rate.
+Without a token the header is ignored and the download routes are not added,
+so only sampling can profile. For a profiled request a background thread
+samples the stacks of all threads every few milliseconds, and the
+instrumentation stages record span timings. Both are written to `<profile_dir>/<id>/` and can be downloaded:
+
+    stacks.folded  folded stacks ("thread;frame;frame count"), for flamegraph.pl or speedscope
+    spans.json     stage spans plus request metadata
+
+Requests that aren't profiled only pay a header lookup and a random draw.
+Requests that raise are saved too, with the exception in spans.json.
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from instrumentation import span_recorder
+
+DEFAULT_PROFILE_DIR = os.path.join(".cache", "profiles")
+PROFILE_HEADER = "X-Profile"
+ARTIFACTS = ("stacks.folded", "spans.json")
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Periodically sample the Python stacks of every thread.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    Sampling profile and stage spans of one request.
+    """
+
+    def __init__(self, interval=0.005):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self.profiler = SamplingProfiler(interval)
+        self._token = None
+
+    def record_span(self, name, coin, model, start, seconds):
+        with self._lock:
+            self.spans.append({"stage": name, "coin": coin, "model": model,
+                               "start_ms": (start - self.start) * 1000, "duration_ms": seconds * 1000})
+
+    def __enter__(self):
+        self._token = span_recorder.set(self.record_span)
+        self.profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stop(self):
+        if self._token is not None:
+            self.profiler.stop()
+            span_recorder.reset(self._token)
+            self._token = None
+            self.duration = time.perf_counter() - self.start
+
+    def save(self, profile_dir, metadata=None):
+        """
+        Write the artifacts to `<profile_dir>/<id>/`.
+
+        Returns:
+            str: Artifact directory.
+        """
+        path = os.path.join(profile_dir, self.id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "stacks.folded"), "w") as f:
+            f.write(self.profiler.folded())
+        with open(os.path.join(path, "spans.json"), "w") as f:
+            json.dump({"id": self.id, "duration_ms": self.duration * 1000, "samples": self.profiler.samples,
+                       "interval_ms": self.profiler.interval * 1000, "spans": self.spans, **(metadata or {})},
+                      f, indent=2)
+        return path
+
+
+def install(app, profile_dir=None, sample_rate=None, admin_token=None, interval=0.005):
+    """
+    Add opt-in request profiling and artifact download routes to a Flask app.
+
+    Args:
+        app (flask.Flask): Application.
+        profile_dir (str): Artifact directory. Defaults to PROFILE_DIR or .cache/profiles.
+        sample_rate (float): Fraction of requests profiled without the header. Defaults to PROFILE_SAMPLE_RATE or 0.
+        admin_token (str): Required value of the header, for profiling a request and for the
+            download routes. Defaults to PROFILE_ADMIN_TOKEN; when unset neither is available.
+        interval (float): Seconds between stack samples.
+    """
+    from flask import abort, g, jsonify, request, send_from_directory
+
+    profile_dir = profile_dir or os.environ.get("PROFILE_DIR", DEFAULT_PROFILE_DIR)
+    sample_rate = float(os.environ.get("PROFILE_SAMPLE_RATE", 0) if sample_rate is None else sample_rate)
+    admin_token = admin_token if admin_token is not None else os.environ.get("PROFILE_ADMIN_TOKEN")
+
+    def authorized():
+        value = request.headers.get(PROFILE_HEADER)
+        return bool(admin_token) and value is not None and hmac.compare_digest(value.encode(), admin_token.encode())
+
+    def save(profile, status, error=None):
+        profile.stop()
+        metadata = {"path": request.path, "method": request.method, "status": status}
+        if error is not None:
+            metadata["error"] = repr(error)
+        profile.save(profile_dir, metadata)
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith("/profiles"):
+            return
+        if authorized() or (sample_rate > 0 and random.random() < sample_rate):
+            g.profile = RequestProfile(interval).__enter__()
+
+    @app.after_request
+    def save_profile(response):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            save(profile, response.status_code)
+            response.headers["X-Profile-Id"] = profile.id
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc):
+        # a request whose exception propagates (e.g. in debug mode) never reaches after_request
+        profile = g.pop("profile", None)
+        if profile is not None:
+            save(profile, 500, exc)
+
+    if not admin_token:
+        return
+
+    @app.route("/profiles", methods=["GET"])
+    def list_profiles():
+        if not authorized():
+            abort(403)
+        ids = sorted(os.listdir(profile_dir), reverse=True) if os.path.isdir(profile_dir) else []
+        return jsonify(ids)
+
+    @app.route("/profiles/<profile_id>/<artifact>", methods=["GET"])
+    def download_profile(profile_id, artifact):
+        if not authorized():
+            abort(403)
+        if artifact not in ARTIFACTS:
+            abort(404)
+        return send_from_directory(os.path.abspath(profile_dir), f"{profile_id}/{artifact}", as_attachment=True)
@@ -0,0 +1,92 @@
+"""
+Lag features and multi-step rollouts for the sentiment forecasters.
+
+`add_lag_features` builds every lag of every column in one strided pass
+instead of one `shift` per lag. `LagRollout` forecasts several coins at once:
+each coin's price lags live in a numpy ring buffer, and every step predicts
+all coins in a single call to a stacked CompiledForest.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def lag_matrix(values, lags):
+    """
+    All lags 1..`lags` of one or more series.
+
+    Args:
+        values (array-like): Series of shape (n,) or (n, k).
+        lags (int): Number of lags.
+
+    Returns:
+        np.ndarray: (n, k, lags) array where [t, j, l - 1] is series j at t - l
+        (NaN before the start of the series).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    padded = np.vstack([np.full((lags, values.shape[1]), np.nan), values])
+    # window t covers padded rows t..t+lags-1, i.e. values t-lags..t-1; reverse to put lag 1 first
+    windows = sliding_window_view(padded[:-1], lags, axis=0)
+    return windows[:, :, ::-1]
+
+
+def add_lag_features(df, columns, lags):
+    """
+    Add `<column>_lag_<l>` for every column and l in 1..`lags`.
+
+    Args:
+        df (pd.DataFrame): Frame in time order.
+        columns (list): Columns to lag.
+        lags (int): Number of lags.
+
+    Returns:
+        pd.DataFrame: `df` with the lag columns appended.
+    """
+    lagged = lag_matrix(df[columns].to_numpy(dtype=float), lags)
+    names = [f'{column}_lag_{lag}' for column in columns for lag in range(1, lags + 1)]
+    frame = pd.DataFrame(lagged.reshape(len(df), -1), columns=names, index=df.index)
+    return pd.concat([df.drop(columns=names, errors='ignore'), frame], axis=1)
+
+
+class LagRollout:
+    """
+    Recursive multi-step forecast of several coins with one stacked forest.
+
+    Each row of the model input is the coin's price lags (lag 1 first) followed
+    by its exogenous features, which are held constant over the horizon. After
+    every step the prediction is written into the coin's ring buffer as the new
+    lag 1, so no features are copied.
+
+    Args:
+        engine (CompiledForest): Stacked engine, forest i for coin i.
+        price_lags (np.ndarray): (n_coins, lags) initial price lags, lag 1 first.
+        exog (np.ndarray): (n_coins, n_exog) features following the price lags.
+    """
+
+    def __init__(self, engine, price_lags, exog):
+        price_lags = np.asarray(price_lags, dtype=float)
+        self.engine = engine
+        self.n_coins, self.lags = price_lags.shape
+        # buffer[:, head] is lag 1; older lags sit at head - 1, head - 2, ... (mod lags)
+        self.buffer = price_lags[:, ::-1].copy()
+        self.head = self.lags - 1
+        self.inputs = np.empty((self.n_coins, self.lags + np.shape(exog)[1]))
+        self.inputs[:, self.lags:] = exog
+        self.forest_index = np.arange(self.n_coins)
+
+    def step(self):
+        order = (self.head - np.arange(self.lags)) % self.lags
+        self.inputs[:, :self.lags] = self.buffer[:, order]
+        predictions = self.engine.predict(self.inputs, forest_index=self.forest_index)
+        self.head = (self.head + 1) % self.lags
+        self.buffer[:, self.head] = predictions
+        return predictions
+
+    def run(self, steps):
+        """
+        Returns:
+            np.ndarray: (n_coins, steps) forecasts.
+        """
+        return np.column_stack([self.step() for _ in range(steps)])
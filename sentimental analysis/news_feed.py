@@ -0,0 +1,258 @@
+"""
+Incremental RSS/Atom news ingestion for the sentiment scripts.
+
+Feeds are fetched concurrently over one pooled requests.Session with
+conditional GETs (ETag / If-Modified-Since), so an unchanged feed costs a 304
+and no parsing. Changed feeds are parsed with a streaming XML parser and their
+items are stored in a local sqlite cache keyed by GUID (or link), so each poll
+only adds the items not seen before. An item stays pending, and is returned
+by every poll, until the consumer acknowledges it with `ack` once it has
+been processed.
+
+Local files (plain paths or file:// URLs) are read directly, which lets tests
+and offline runs use stub feeds.
+"""
+import email.utils
+import io
+import logging
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_FEEDS = [
+    "https://www.coindesk.com/arc/outboundfeeds/rss/",  # CoinDesk
+    "https://cointelegraph.com/rss",                   # CoinTelegraph
+    "https://cryptoslate.com/feed/"                    # CryptoSlate
+]
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "news", "feeds.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    key TEXT PRIMARY KEY,
+    source TEXT,
+    published TEXT,
+    title TEXT,
+    link TEXT,
+    first_seen REAL,
+    consumed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS items_published ON items (published);
+"""
+
+# caches created before items were acknowledged; their items count as consumed
+MIGRATION = """
+ALTER TABLE items ADD COLUMN consumed INTEGER NOT NULL DEFAULT 0;
+UPDATE items SET consumed = 1;
+"""
+
+
+def _local_path(url):
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return parsed.path
+    if parsed.scheme == "":
+        return url
+    return None
+
+
+def _tag(elem):
+    # strip XML namespaces, e.g. "{http://www.w3.org/2005/Atom}entry" -> "entry"
+    return elem.tag.rsplit("}", 1)[-1]
+
+
+def _published(value):
+    # RSS uses RFC 822 dates, Atom uses ISO 8601; store ISO 8601 UTC either way
+    if not value:
+        return None
+    try:
+        parsed = pd.Timestamp(email.utils.parsedate_to_datetime(value))
+    except (TypeError, ValueError):
+        parsed = pd.to_datetime(value, errors="coerce")
+    if pd.isna(parsed):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.tz_localize("UTC")
+    return parsed.tz_convert("UTC").isoformat()
+
+
+def parse_items(content):
+    """
+    Stream the items of an RSS or Atom document.
+
+    Elements are cleared as soon as each item is read, so memory does not
+    grow with the size of the feed.
+
+    Args:
+        content (bytes): Feed document.
+
+    Yields:
+        dict: 'key', 'published', 'title' and 'link' of each item.
+    """
+    for _, elem in ET.iterparse(io.BytesIO(content), events=("end",)):
+        if _tag(elem) not in ("item", "entry"):
+            continue
+        fields = {}
+        for child in elem:
+            name = _tag(child)
+            if name == "link" and child.get("href"):
+                fields.setdefault("link", child.get("href"))
+            elif child.text:
+                fields.setdefault(name, child.text.strip())
+        title = fields.get("title")
+        key = fields.get("guid") or fields.get("id") or fields.get("link") or title
+        if title and key:
+            yield {
+                "key": key,
+                "published": _published(fields.get("pubDate") or fields.get("published") or fields.get("updated")),
+                "title": title,
+                "link": fields.get("link"),
+            }
+        elem.clear()
+
+
+class NewsFeed:
+    """
+    Poll a set of feeds and keep every item seen in a sqlite cache.
+
+    Args:
+        feeds (list): Feed URLs, file:// URLs or local paths.
+        cache_path (str): sqlite file holding feed validators and items.
+        session (requests.Session): Session to fetch with; a pooled one is created if None.
+        max_workers (int): Feeds fetched at once.
+        timeout (float): Per-request timeout in seconds.
+    """
+
+    def __init__(self, feeds=DEFAULT_FEEDS, cache_path=DEFAULT_CACHE_PATH, session=None, max_workers=8, timeout=10):
+        self.feeds = list(feeds)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.feeds), pool_maxsize=max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        if os.path.dirname(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.db = sqlite3.connect(cache_path)
+        self.db.executescript(SCHEMA)
+        if "consumed" not in {row[1] for row in self.db.execute("PRAGMA table_info(items)")}:
+            self.db.executescript(MIGRATION)
+        self.db.execute("CREATE INDEX IF NOT EXISTS items_pending ON items (consumed)")
+
+    def _validators(self, url):
+        row = self.db.execute("SELECT etag, last_modified FROM feeds WHERE url = ?", (url,)).fetchone()
+        return row or (None, None)
+
+    def _fetch(self, url, etag, last_modified):
+        # returns (content or None if unchanged, etag, last_modified)
+        path = _local_path(url)
+        if path is not None:
+            modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+            if modified == last_modified:
+                return None, None, modified
+            with open(path, "rb") as f:
+                return f.read(), None, modified
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None, etag, last_modified
+        response.raise_for_status()
+        return response.content, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    def poll(self):
+        """
+        Fetch all feeds once and store their new items.
+
+        Returns:
+            pd.DataFrame: Pending items, i.e. new ones and those returned before but not yet
+            passed to `ack`, with 'date', 'text', 'source', 'link' and 'key' columns.
+        """
+        validators = {url: self._validators(url) for url in self.feeds}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {url: pool.submit(self._fetch, url, *validators[url]) for url in self.feeds}
+
+        now = time.time()
+        for url, future in futures.items():
+            try:
+                content, etag, last_modified = future.result()
+            except Exception as e:
+                logging.error(f"Failed to fetch news from {url}: {e}")
+                continue
+            if content is None:
+                logging.info(f"Feed unchanged: {url}")
+                continue
+            try:
+                items = list(parse_items(content))
+            except ET.ParseError as e:
+                logging.error(f"Failed to parse news from {url}: {e}")
+                continue
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO items (key, source, published, title, link, first_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(item["key"], url, item["published"], item["title"], item["link"], now) for item in items])
+                self.db.execute("INSERT OR REPLACE INTO feeds (url, etag, last_modified, fetched_at) "
+                                "VALUES (?, ?, ?, ?)", (url, etag, last_modified, now))
+            logging.info(f"Fetched news from {url}: {len(items)} items")
+        return self._query("WHERE consumed = 0")
+
+    def ack(self, keys):
+        """
+        Mark items as consumed, so later polls no longer return them.
+
+        Call it only after the items were processed (e.g. scored and stored), so
+        a failure in between leaves them pending for the next poll.
+
+        Args:
+            keys (iterable): 'key' values of items returned by `poll`.
+        """
+        with self.db:
+            self.db.executemany("UPDATE items SET consumed = 1 WHERE key = ?", [(key,) for key in keys])
+
+    def items(self, since=None):
+        """
+        All cached items, optionally only those published at or after `since`.
+
+        Returns:
+            pd.DataFrame: 'date', 'text', 'source', 'link' and 'key' columns.
+        """
+        if since is None:
+            return self._query()
+        # published is stored as ISO 8601 UTC, so compare against `since` in UTC too
+        ts = pd.Timestamp(since)
+        ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+        return self._query("WHERE published >= ?", (ts.isoformat(),))
+
+    def _query(self, where="", params=()):
+        query = f"SELECT published AS date, title AS text, source, link, key FROM items {where} ORDER BY published"
+        rows = self.db.execute(query, params).fetchall()
+        return self._frame([dict(zip(("date", "text", "source", "link", "key"), row)) for row in rows])
+
+    @staticmethod
+    def _frame(rows):
+        df = pd.DataFrame(rows, columns=["date", "text", "source", "link", "key"])
+        df["date"] = pd.to_datetime(df["date"], utc=True, errors="coerce")
+        return df
+
+    def close(self):
+        self.db.close()
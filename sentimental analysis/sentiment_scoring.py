@@ -0,0 +1,133 @@
+"""
+Batched, memoized VADER scoring of news headlines.
+
+Headlines are cleaned with precompiled regexes and keyed by a hash of their
+normalized text. Scores are kept in a sqlite cache, so a run only scores the
+distinct headlines it hasn't seen before. Large backlogs are split into
+batches scored in a process pool whose workers each build one analyzer.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "news", "sentiment.sqlite")
+
+URL_PATTERN = re.compile(r"http\S+")
+NON_ALPHA_PATTERN = re.compile(r"[^a-zA-Z\s]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# sqlite limits the number of parameters per statement
+_LOOKUP_CHUNK = 900
+
+_analyzer = None
+
+
+def clean_text(text):
+    text = URL_PATTERN.sub("", text)  # Remove URLs
+    text = NON_ALPHA_PATTERN.sub("", text)  # Remove non-alphabetic characters
+    return text.lower()
+
+
+def text_key(clean):
+    # headlines differing only in spacing share a score
+    normalized = WHITESPACE_PATTERN.sub(" ", clean).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def vader_analyzer():
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+
+def _init_worker(analyzer_factory):
+    global _analyzer
+    _analyzer = analyzer_factory()
+
+
+def _score_batch(texts):
+    return [_analyzer.polarity_scores(text)['compound'] for text in texts]
+
+
+class SentimentScorer:
+    """
+    Score headlines with VADER, memoizing compound scores on disk.
+
+    Args:
+        cache_path (str): sqlite file of text hash -> compound score.
+        batch_size (int): Headlines per worker task.
+        max_workers (int): Worker processes; defaults to the number of cores.
+        min_parallel (int): Below this many unseen headlines, score in-process.
+        analyzer_factory (callable): Top-level function returning an object with polarity_scores.
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, batch_size=2000, max_workers=None, min_parallel=5000,
+                 analyzer_factory=vader_analyzer):
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_parallel = min_parallel
+        self.analyzer_factory = analyzer_factory
+        self.analyzer = None
+        if os.path.dirname(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.db = sqlite3.connect(cache_path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, compound REAL)")
+        self.scored = 0
+
+    def _cached(self, keys):
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.db.execute(f"SELECT key, compound FROM scores WHERE key IN ({placeholders})", chunk))
+        return found
+
+    def _score(self, texts):
+        if len(texts) < self.min_parallel or self.max_workers == 1:
+            if self.analyzer is None:
+                self.analyzer = self.analyzer_factory()
+            return [self.analyzer.polarity_scores(text)['compound'] for text in texts]
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(self.analyzer_factory,)) as pool:
+            return [score for batch in pool.map(_score_batch, batches) for score in batch]
+
+    def score(self, texts):
+        """
+        Compound sentiment of each raw headline.
+
+        Args:
+            texts (iterable): Raw headlines.
+
+        Returns:
+            np.ndarray: Compound scores aligned with `texts`.
+        """
+        cleaned = [clean_text(text) for text in texts]
+        keys = [text_key(text) for text in cleaned]
+        unique = dict(zip(keys, cleaned))
+        scores = self._cached(list(unique))
+
+        missing = [key for key in unique if key not in scores]
+        if missing:
+            new_scores = self._score([unique[key] for key in missing])
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO scores (key, compound) VALUES (?, ?)",
+                                    zip(missing, new_scores))
+            scores.update(zip(missing, new_scores))
+            self.scored += len(missing)
+        return np.array([scores[key] for key in keys], dtype=float)
+
+    def add_sentiment_scores(self, df):
+        """
+        Add 'clean_text' and 'sentiment_score' columns for the 'text' column of a news frame.
+        """
+        df = df.copy()
+        df['clean_text'] = df['text'].map(clean_text)
+        df['sentiment_score'] = self.score(df['text'])
+        return df
+
+    def close(self):
+        self.db.close()
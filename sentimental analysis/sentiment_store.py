@@ -0,0 +1,152 @@
+"""
+Persistent daily news sentiment series.
+
+Scores are kept as a running sum and count per (day, source) in sqlite. New
+items are upserted by adding their per-day totals, which costs O(new items);
+item keys already counted are skipped, so re-submitting an item is harmless.
+Consumers read daily means for just the date range they need with `daily`, or
+align them to their own dates with the as-of `lookup`.
+"""
+import hashlib
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_PATH = os.path.join(".cache", "news", "sentiment_series.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, source)
+);
+CREATE TABLE IF NOT EXISTS counted (
+    key TEXT PRIMARY KEY
+);
+"""
+
+
+def _days(dates):
+    # accepts datetime.date objects, strings or timestamps (tz-aware ones are taken in UTC)
+    dates = pd.to_datetime(pd.Series(dates), utc=True, errors="coerce")
+    return dates.dt.tz_localize(None).to_numpy(dtype="datetime64[D]")
+
+
+def _item_key(row):
+    return hashlib.sha1(f"{row['date']}|{row['text']}".encode("utf-8")).hexdigest()
+
+
+class SentimentStore:
+    """
+    Running per-day, per-source sentiment aggregates.
+
+    Args:
+        path (str): sqlite file of the series.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def upsert(self, news_df):
+        """
+        Add scored news items to the series.
+
+        Args:
+            news_df (pd.DataFrame): Items with 'date' and 'sentiment_score', and optionally
+                'source' and 'key' (e.g. from news_feed.NewsFeed). Items without a key are
+                identified by their date and text.
+
+        Returns:
+            int: Number of items added (items counted before are skipped).
+        """
+        if news_df.empty:
+            return 0
+        df = pd.DataFrame({
+            'day': _days(news_df['date']),
+            'source': news_df['source'].fillna('') if 'source' in news_df else '',
+            'score': news_df['sentiment_score'].to_numpy(dtype=float),
+            'key': news_df['key'] if 'key' in news_df else news_df.apply(_item_key, axis=1),
+        }).dropna(subset=['day', 'score'])
+
+        with self.db:
+            fresh = [self.db.execute("INSERT OR IGNORE INTO counted (key) VALUES (?)", (key,)).rowcount == 1
+                     for key in df['key']]
+            df = df[np.array(fresh, dtype=bool)]
+            totals = df.groupby(['day', 'source'])['score'].agg(['sum', 'count']).reset_index()
+            self.db.executemany(
+                "INSERT INTO daily (day, source, total, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, source) DO UPDATE SET total = total + excluded.total, "
+                "count = count + excluded.count",
+                [(str(day)[:10], source, float(total), int(count))
+                 for day, source, total, count in totals.itertuples(index=False)])
+        return len(df)
+
+    def daily(self, start=None, end=None, by_source=False):
+        """
+        Daily mean sentiment between `start` and `end` (inclusive).
+
+        Returns:
+            pd.DataFrame: Indexed by date ('source' too if `by_source`), with 'news_sentiment'
+            and 'news_count' columns.
+        """
+        group = "day, source" if by_source else "day"
+        where, params = [], []
+        if start is not None:
+            where.append("day >= ?")
+            params.append(str(pd.Timestamp(start).date()))
+        if end is not None:
+            where.append("day <= ?")
+            params.append(str(pd.Timestamp(end).date()))
+        query = f"SELECT {group}, SUM(total) / SUM(count), SUM(count) FROM daily"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" GROUP BY {group} ORDER BY {group}"
+        columns = ['date', 'source'] if by_source else ['date']
+        df = pd.DataFrame(self.db.execute(query, params).fetchall(),
+                          columns=columns + ['news_sentiment', 'news_count'])
+        df['date'] = pd.to_datetime(df['date'])
+        return df.set_index(columns)
+
+    def lookup(self, dates, max_age_days=0, fill=0.0):
+        """
+        As-of daily sentiment for arbitrary dates.
+
+        Each date gets the mean of the latest stored day on or before it, if that
+        day is at most `max_age_days` old, else `fill`. Only the stored days in
+        the requested range are read.
+
+        Args:
+            dates (array-like): Dates to look up, in any order.
+            max_age_days (int): How stale a day may be; 0 means exact-day matches only.
+            fill (float): Value for dates without sentiment.
+
+        Returns:
+            np.ndarray: Sentiment aligned with `dates`.
+        """
+        days = _days(dates)
+        result = np.full(len(days), fill, dtype=float)
+        valid = ~np.isnat(days)
+        if not valid.any():
+            return result
+        start = days[valid].min() - np.timedelta64(max_age_days, 'D')
+        series = self.daily(start=str(start), end=str(days[valid].max()))
+        if series.empty:
+            return result
+        stored = series.index.to_numpy(dtype="datetime64[D]")
+        values = series['news_sentiment'].to_numpy()
+        position = np.searchsorted(stored, days[valid], side='right') - 1
+        found = position >= 0
+        age = (days[valid] - stored[np.maximum(position, 0)]).astype(int)
+        found &= age <= max_age_days
+        result[np.flatnonzero(valid)[found]] = values[position[found]]
+        return result
+
+    def close(self):
+        self.db.close()
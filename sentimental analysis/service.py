@@ -0,0 +1,171 @@
+"""
+Resident sentiment / price forecast service.
+
+Unlike running SA.py once, the service stays up and keeps its state warm: the
+VADER analyzer and lexicon, the news and score caches, each coin's feature
+frame and its trained forest. Every tick polls the feeds and recomputes only
+what depends on changed inputs. New headlines update the sentiment series, and
+a coin's features and forest are rebuilt only when its price file or the
+sentiment days its features read (the range of its price history) changed
+since the last tick, so news outside a coin's dates does not retrain it.
+
+The service serves SA.py's next-day model. SA_30.py (30-day forecasts) and
+SA1.PY (7-day lags) stay batch scripts; they share the feed and sentiment
+caches, so running them alongside the service only scores new headlines.
+
+Example:
+    python "sentimental analysis/service.py" --interval 900
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+
+import nltk
+import pandas as pd
+
+import SA
+from news_feed import DEFAULT_FEEDS, NewsFeed
+from sentiment_scoring import SentimentScorer
+from sentiment_store import SentimentStore
+
+COINS = {
+    "Bitcoin": os.path.join("data loader", "Combined_BTC_Data.csv"),
+    "Ethereum": os.path.join("data loader", "Combined_ETH_Data.csv"),
+    "Solana": os.path.join("data loader", "Combined_SOL_Data.csv"),
+}
+
+
+def ensure_vader_lexicon():
+    # download once; later starts find the lexicon locally
+    try:
+        nltk.data.find("sentiment/vader_lexicon.zip")
+    except LookupError:
+        nltk.download("vader_lexicon", quiet=True)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SentimentService:
+    """
+    Keep the sentiment pipeline and per-coin forests in memory between ticks.
+
+    Args:
+        coins (dict): Coin name to price CSV path.
+        feeds (list): News feed URLs.
+        interval (float): Seconds between ticks in run_forever.
+        compare_prices (bool): Log the error of each prediction against the live price.
+    """
+
+    def __init__(self, coins=COINS, feeds=DEFAULT_FEEDS, interval=3600, compare_prices=True):
+        ensure_vader_lexicon()
+        self.coins = dict(coins)
+        self.interval = interval
+        self.compare_prices = compare_prices
+        self.feed = NewsFeed(feeds)
+        self.scorer = SentimentScorer()
+        self.store = SentimentStore()
+        self.frames = {}
+        self.models = {}
+        self.predictions = {}
+        # coin -> (price file signature, sentiment digest) its model was built from
+        self._inputs = {}
+        # coin -> (first, last) date of its price file, the sentiment days its features read
+        self._date_ranges = {}
+
+    def update_sentiment(self):
+        news_df = self.feed.poll()
+        if news_df.empty:
+            return 0
+        added = self.store.upsert(self.scorer.add_sentiment_scores(news_df))
+        # acknowledged only once stored; if scoring or the upsert fails the items are polled again
+        self.feed.ack(news_df['key'])
+        logging.info(f"Sentiment series updated with {added} new items")
+        return added
+
+    def sentiment_digest(self, start, end):
+        # hash of the stored daily sentiment between start and end
+        rows = self.store.daily(start, end)
+        return hashlib.sha1(pd.util.hash_pandas_object(rows).to_numpy().tobytes()).hexdigest()
+
+    def update_coin(self, coin, path):
+        signature = file_signature(path)
+        previous = self._inputs.get(coin)
+        if previous is not None and previous[0] == signature:
+            if previous[1] == self.sentiment_digest(*self._date_ranges[coin]):
+                return False
+        else:
+            dates = pd.to_datetime(pd.read_csv(path, usecols=['Date'])['Date'], format='mixed', errors='coerce')
+            self._date_ranges[coin] = (dates.min(), dates.max())
+        inputs = (signature, self.sentiment_digest(*self._date_ranges[coin]))
+        frame = SA.preprocess_crypto_data(path, self.store)
+        result = SA.train_and_predict(frame, coin)
+        if result is None:
+            return False
+        self.frames[coin] = frame
+        self.models[coin], self.predictions[coin] = result
+        self._inputs[coin] = inputs
+        return True
+
+    def tick(self):
+        """
+        Run one pass of the pipeline, skipping stages whose inputs are unchanged.
+
+        Returns:
+            dict: Coin name to its latest predicted price.
+        """
+        self.update_sentiment()
+        for coin, path in self.coins.items():
+            try:
+                if self.update_coin(coin, path):
+                    logging.info(f"Retrained {coin}")
+            except Exception as e:
+                logging.error(f"Failed to update {coin}: {e}")
+
+        if self.compare_prices and self.predictions:
+            current_prices = SA.fetch_current_prices()
+            for coin, predicted in self.predictions.items():
+                if current_prices and coin in current_prices:
+                    SA.calculate_precision(current_prices[coin], predicted)
+        return dict(self.predictions)
+
+    def run_forever(self):
+        while True:
+            start = time.monotonic()
+            try:
+                predictions = self.tick()
+                logging.info(f"Predicted prices: {predictions}")
+            except Exception as e:
+                logging.error(f"Tick failed: {e}")
+            time.sleep(max(self.interval - (time.monotonic() - start), 0))
+
+    def close(self):
+        self.feed.close()
+        self.scorer.close()
+        self.store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the sentiment forecast service")
+    parser.add_argument("--interval", type=float, default=3600, help="Seconds between ticks")
+    parser.add_argument("--once", action="store_true", help="Run a single tick and exit")
+    parser.add_argument("--no-price-check", action="store_true", help="Skip comparing with live prices")
+    cli = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    service = SentimentService(interval=cli.interval, compare_prices=not cli.no_price_check)
+    try:
+        if cli.once:
+            print(service.tick())
+        else:
+            service.run_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
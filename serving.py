@@ -0,0 +1,470 @@
+"""
+Ensemble serving over the models/ backends.
+
+An EnsemblePredictor holds one fitted wrapper per (coin, backend). Backends
+are fitted in a background pool and each one is served as soon as it is
+ready. A prediction runs the ready backends of the coin concurrently in a
+shared thread pool and waits for each one at most its own timeout; backends
+that time out, fail or are still fitting are dropped and the blend is
+renormalized over the ones that answered. Blend weights are inverse backtest
+MSE, so the more accurate backends count more. A backend whose fit failed is
+refitted once its retry backoff expires.
+
+A TieredPredictor answers single-model requests from a resident EWMA fallback
+while a coin's heavy model is missing, stale or retraining in the background.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pandas as pd
+
+from dataset import prepare_data, window_columns
+from instrumentation import MODEL_CACHE, stage
+from train_matrix import DATE_MODELS, DEFAULT_MODEL_ARGS
+
+
+def weights_from_backtest(results):
+    """
+    Blend weights proportional to 1 / MSE from a backtest.backtest result.
+
+    Returns:
+        dict: Model name to weight, summing to 1. Models without a finite error are left out.
+    """
+    inverse = {}
+    for name, result in results.items():
+        rmse = result["metrics"]["rmse"]
+        if np.isfinite(rmse) and rmse > 0:
+            inverse[name] = 1.0 / rmse ** 2
+    total = sum(inverse.values())
+    return {name: value / total for name, value in inverse.items()}
+
+
+def weights_path(coin, weights_dir="models"):
+    return os.path.join(weights_dir, f"ensemble_weights_{coin}.json")
+
+
+def retry_backoff_seconds(failures, retry_backoff, max_retry_backoff):
+    """
+    Seconds to wait before retrying after `failures` consecutive failures: doubling, capped.
+    """
+    return min(retry_backoff * 2 ** (failures - 1), max_retry_backoff)
+
+
+class NotReady(RuntimeError):
+    """
+    No backend of a coin is fitted yet; its fit is running or will be retried.
+
+    Args:
+        message (str): What the coin is waiting for.
+        retry_after (float): Seconds after which the caller may try again.
+    """
+
+    def __init__(self, message, retry_after=5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def latest_window(df, look_back=5):
+    """
+    The newest look-back window of a coin, as one row of features.
+
+    Returns:
+        tuple: (1 x n_features array, date of the bar being predicted).
+    """
+    values = df.drop(columns=['Date'], errors='ignore').to_numpy(dtype=float)
+    window = values[-look_back:].reshape(1, -1)
+    next_date = None
+    if 'Date' in df:
+        dates = pd.to_datetime(df['Date'])
+        next_date = dates.iloc[-1] + dates.diff().median()
+    return window, next_date
+
+
+class EnsemblePredictor:
+    """
+    Fit several models/ backends per coin and serve a blended prediction.
+
+    Args:
+        model_names (list): Keys of models.MODELS.
+        model_args (dict): Overrides for DEFAULT_MODEL_ARGS.
+        timeout (float): Default per-backend timeout in seconds.
+        timeouts (dict): Per-backend timeouts overriding `timeout`.
+        max_workers (int): Threads shared by all predictions. A backend that is
+            still running after its timeout keeps its thread until it returns, and
+            gets no new calls for that coin until then, so a hung backend holds at
+            most one thread per coin.
+        fit_workers (int): Background threads fitting backends.
+        fit_n_jobs (int): Threads each backend fit may use (e.g. the XGBoost
+            hyperparameter search), unless `model_args` sets n_jobs, so fits don't
+            take every core from the requests being served.
+        look_back (int): Window length.
+        weights_dir (str): Directory of ensemble_weights_<coin>.json files.
+        retry_backoff (float): Seconds before refitting a backend whose fit failed.
+        max_retry_backoff (float): Cap of the backoff, which doubles per consecutive failure.
+    """
+
+    def __init__(self, model_names, model_args=None, timeout=2.0, timeouts=None, max_workers=None, fit_workers=None,
+                 fit_n_jobs=2, look_back=5, weights_dir="models", retry_backoff=30.0, max_retry_backoff=600.0):
+        self.model_names = list(model_names)
+        self.model_args = dict(DEFAULT_MODEL_ARGS, n_jobs=fit_n_jobs)
+        self.model_args.update(model_args or {})
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.look_back = look_back
+        self.weights_dir = weights_dir
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or 2 * len(self.model_names),
+                                       thread_name_prefix="ensemble")
+        # fits get their own threads so they never queue predictions behind them
+        self.fit_pool = ThreadPoolExecutor(max_workers=fit_workers or len(self.model_names),
+                                           thread_name_prefix="ensemble-fit")
+        self.models = {}
+        self.weights = {}
+        self.fit_errors = {}
+        # coin -> backends whose fit is still running
+        self.fitting = {}
+        # (coin, backend) -> consecutive failed fits, and when the next fit may start
+        self.fit_failures = {}
+        self.retry_at = {}
+        # (coin, backend) pairs with a predict call still running, possibly past its timeout
+        self.running = set()
+        self.lock = threading.Lock()
+
+    def _fit_one(self, name, coin, frame):
+        from models import MODELS
+
+        model = MODELS[name](Namespace(**dict(self.model_args, coin=coin)))
+        with stage("fit", coin, name):
+            if name in DATE_MODELS:
+                model.fit(frame.copy())
+            else:
+                model.fit(frame.drop(columns=['Date']).copy())
+        return model
+
+    def _fitted(self, coin, name, future):
+        # done callback of a background fit: publish the backend as soon as it is ready
+        try:
+            model, error = future.result(), None
+        except Exception as e:
+            logging.warning(f"Could not fit {name} for {coin}: {e}")
+            model, error = None, repr(e)
+        with self.lock:
+            if model is not None:
+                self.models.setdefault(coin, {})[name] = model
+                self.fit_errors.get(coin, {}).pop(name, None)
+                self.fit_failures.pop((coin, name), None)
+                self.retry_at.pop((coin, name), None)
+            else:
+                self.fit_errors.setdefault(coin, {})[name] = error
+                failures = self.fit_failures.get((coin, name), 0) + 1
+                self.fit_failures[(coin, name)] = failures
+                self.retry_at[(coin, name)] = time.monotonic() + retry_backoff_seconds(
+                    failures, self.retry_backoff, self.max_retry_backoff)
+            pending = self.fitting[coin]
+            pending.discard(name)
+            if not pending:
+                del self.fitting[coin]
+
+    def fit(self, coin, df):
+        """
+        Start fitting the backends of a coin that need it in the background.
+
+        Backends that are fitted, still fitting, or failed and waiting out their
+        retry backoff are skipped, so this is cheap to call on every request.
+        Returns at once; each backend is served by `predict` as soon as its fit
+        finishes.
+
+        Args:
+            coin (str): Coin symbol.
+            df (pd.DataFrame): Cleaned price data with a 'Date' column.
+
+        Returns:
+            bool: False if no backend needed a fit.
+        """
+        with self.lock:
+            pending = self.fitting.get(coin, set())
+            fitted = self.models.get(coin, {})
+            now = time.monotonic()
+            names = [name for name in self.model_names
+                     if name not in pending and name not in fitted and now >= self.retry_at.get((coin, name), 0.0)]
+            if not names:
+                return False
+            self.fitting[coin] = pending | set(names)
+        self.load_weights(coin)
+        with stage("window", coin):
+            windows = prepare_data(df, self.look_back)
+            frame = pd.DataFrame(windows, columns=window_columns(windows.shape[1]))
+            frame.insert(0, 'Date', pd.to_datetime(df['Date']).to_numpy()[self.look_back:][:len(frame)])
+        for name in names:
+            future = self.fit_pool.submit(self._fit_one, name, coin, frame)
+            future.add_done_callback(lambda f, name=name: self._fitted(coin, name, f))
+        return True
+
+    def status(self, coin):
+        """
+        Fit state of a coin: "missing", "fitting" (some backends ready or pending), "ready" (at least
+        one backend fitted and none pending) or "failed" (every fit failed; retried after a backoff).
+        """
+        with self.lock:
+            if coin in self.fitting:
+                return "fitting"
+            if self.models.get(coin):
+                return "ready"
+            return "failed" if self.fit_errors.get(coin) else "missing"
+
+    def load_weights(self, coin):
+        # weights written by the backtest CLI; equal weights until a backtest has run
+        path = weights_path(coin, self.weights_dir)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.weights[coin] = json.load(f)
+        else:
+            self.weights[coin] = {}
+
+    def _predict_one(self, name, coin, model, window, next_date):
+        try:
+            frame = pd.DataFrame(window, columns=window_columns(window.shape[1] + 1)[:-1])
+            if name in DATE_MODELS:
+                frame.insert(0, 'Date', [next_date])
+            with stage("predict", coin, name):
+                return float(np.asarray(model.predict(frame), dtype=float).ravel()[-1])
+        finally:
+            with self.lock:
+                self.running.discard((coin, name))
+
+    def predict(self, coin, window, next_date=None):
+        """
+        Blend the backends of a coin on one window.
+
+        Args:
+            coin (str): Coin symbol, passed to `fit` before.
+            window (np.ndarray): 1 x n_features row, e.g. from latest_window.
+            next_date (pd.Timestamp): Date of the predicted bar, for date-based backends.
+
+        Returns:
+            dict: 'prediction' (the blend), 'predictions' and 'weights' per backend that
+            answered, 'dropped' (backend -> reason) and 'latency_ms'.
+
+        Raises:
+            NotReady: No backend of the coin is fitted; its `retry_after` is the time
+            until the next fit can start if every fit failed.
+        """
+        start = time.perf_counter()
+        with self.lock:
+            models = dict(self.models.get(coin, {}))
+            dropped = dict(self.fit_errors.get(coin, {}))
+            pending = set(self.fitting.get(coin, ()))
+            dropped.update({name: "fitting" for name in pending})
+            # a backend still running an earlier call (past its timeout) gets no new one
+            busy = {name for name in models if (coin, name) in self.running}
+            self.running.update((coin, name) for name in models if name not in busy)
+            retry_at = [self.retry_at[(coin, name)] for name in self.model_names if (coin, name) in self.retry_at]
+        if not models:
+            if pending or not retry_at:
+                raise NotReady(f"The ensemble for {coin} is still fitting")
+            raise NotReady(f"Every backend of {coin} failed to fit: {dropped}",
+                           retry_after=max(min(retry_at) - time.monotonic(), 1.0))
+        dropped.update({name: "busy" for name in busy})
+        # each backend runs in a copy of the caller's context, so a profiled request keeps its spans
+        futures = {name: self.pool.submit(contextvars.copy_context().run, self._predict_one, name, coin, model,
+                                          window, next_date)
+                   for name, model in models.items() if name not in busy}
+        predictions = {}
+        for name, future in futures.items():
+            deadline = start + self.timeouts.get(name, self.timeout)
+            try:
+                predictions[name] = future.result(timeout=max(deadline - time.perf_counter(), 0))
+            except FutureTimeoutError:
+                if future.cancel():
+                    # never started, so _predict_one won't clear it
+                    with self.lock:
+                        self.running.discard((coin, name))
+                dropped[name] = "timeout"
+            except Exception as e:
+                dropped[name] = repr(e)
+        if not predictions:
+            raise RuntimeError(f"No backend answered for {coin}: {dropped}")
+
+        # renormalize over the backends that answered; unknown backends share the mean weight
+        known = self.weights.get(coin, {})
+        default = np.mean(list(known.values())) if known else 1.0
+        raw = {name: known.get(name, default) for name in predictions}
+        total = sum(raw.values())
+        weights = {name: value / total for name, value in raw.items()}
+        blend = sum(weights[name] * predictions[name] for name in predictions)
+        return {'prediction': float(blend), 'predictions': predictions, 'weights': weights, 'dropped': dropped,
+                'latency_ms': (time.perf_counter() - start) * 1000}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.fit_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class EWMAFallback:
+    """
+    Cheap per-coin fallback: exponentially weighted level and trend of recent prices.
+
+    Refreshing it is one vectorized pass over the last `tail` prices, so it can
+    be updated on every ingest and answer while a heavy model is unavailable.
+    """
+
+    def __init__(self, span=10, tail=None):
+        self.alpha = 2.0 / (span + 1)
+        self.tail = tail or 10 * span
+        self.level = None
+        self.trend = 0.0
+
+    def update(self, prices):
+        prices = np.asarray(prices, dtype=float)[-self.tail:]
+        weights = (1 - self.alpha) ** np.arange(len(prices))[::-1]
+        if len(prices) > 1:
+            self.trend = float(np.average(np.diff(prices), weights=weights[1:]))
+        # the EWMA of a trending series lags by trend * (1 - alpha) / alpha
+        self.level = float(np.average(prices, weights=weights)) + self.trend * (1 - self.alpha) / self.alpha
+        return self
+
+    def predict(self):
+        return self.level + self.trend
+
+
+class _Tier:
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.model = None
+        self.trained_rows = 0
+        self.training = False
+        self.error = None
+        # after a failed training: rows it saw, consecutive failures and when to try again
+        self.failed_rows = 0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+
+class TieredPredictor:
+    """
+    Serve from a heavy model when it is ready and from a resident fallback otherwise.
+
+    Every request refreshes the coin's EWMAFallback. The heavy model (built by
+    `factory(coin)`) is trained or updated in a background thread whenever it
+    is missing or behind the data; while that runs, or when it is more than
+    `stale_rows` rows behind, requests are answered by the fallback, so the
+    request path never trains. A failed training is not retried until new
+    rows arrive or its backoff (doubling per consecutive failure, from
+    `retry_backoff` up to `max_retry_backoff` seconds) expires.
+
+    Args:
+        factory (callable): coin -> unfitted wrapper (fit/partial_fit/predict on windowed rows).
+        look_back (int): Window length.
+        stale_rows (int): Rows a ready heavy model may lag the data and still serve.
+        fallback_span (int): EWMA span of the fallback.
+        max_workers (int): Background training threads.
+        model_name (str): Name of the heavy model in metrics.
+        retry_backoff (float): Seconds before retrying a failed training on the same data.
+        max_retry_backoff (float): Cap of the backoff.
+    """
+
+    def __init__(self, factory, look_back=5, stale_rows=50, fallback_span=10, max_workers=1, model_name="heavy",
+                 retry_backoff=30.0, max_retry_backoff=600.0):
+        self.factory = factory
+        self.model_name = model_name
+        self.look_back = look_back
+        self.stale_rows = stale_rows
+        self.fallback_span = fallback_span
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="heavy-train")
+        self.tiers = {}
+        self.lock = threading.Lock()
+
+    def _tier(self, coin):
+        with self.lock:
+            if coin not in self.tiers:
+                self.tiers[coin] = _Tier(EWMAFallback(self.fallback_span))
+            return self.tiers[coin]
+
+    def _train(self, coin, tier, df):
+        try:
+            with stage("window", coin):
+                windows = prepare_data(df, self.look_back)
+                frame = pd.DataFrame(windows, columns=window_columns(windows.shape[1]))
+            model = tier.model if tier.model is not None else self.factory(coin)
+            with stage("fit", coin, self.model_name):
+                if hasattr(model, 'partial_fit'):
+                    model.partial_fit(frame)
+                else:
+                    model.fit(frame)
+            with tier.lock:
+                tier.model, tier.trained_rows, tier.error, tier.failures = model, len(df), None, 0
+        except Exception as e:
+            logging.exception(f"Heavy model training failed for {coin}")
+            with tier.lock:
+                tier.error = repr(e)
+                tier.failed_rows = len(df)
+                tier.failures += 1
+                tier.retry_at = time.monotonic() + retry_backoff_seconds(tier.failures, self.retry_backoff,
+                                                                         self.max_retry_backoff)
+        finally:
+            tier.training = False
+
+    def _should_train(self, tier, n_rows):
+        if tier.training or (tier.model is not None and n_rows <= tier.trained_rows):
+            return False
+        # after a failure, wait for new rows or the end of the backoff
+        return tier.error is None or n_rows > tier.failed_rows or time.monotonic() >= tier.retry_at
+
+    def predict(self, coin, df):
+        """
+        Predict the next price of a coin.
+
+        Args:
+            coin (str): Coin symbol.
+            df (pd.DataFrame): Cleaned numeric price data, 'Price' first, no 'Date'.
+
+        Returns:
+            dict: 'prediction', 'tier' ("heavy" or "fallback") and 'status' of the heavy model
+            ("ready", "missing", "training", "stale" or "failed").
+        """
+        tier = self._tier(coin)
+        tier.fallback.update(df['Price'].to_numpy())
+        window = df.to_numpy(dtype=float)[-self.look_back:].reshape(1, -1)
+
+        with tier.lock:
+            if tier.training:
+                status = "training"
+            elif tier.model is None:
+                status = "failed" if tier.error else "missing"
+            elif len(df) - tier.trained_rows > self.stale_rows:
+                status = "stale"
+            else:
+                status = "ready"
+
+            prediction, used = None, "fallback"
+            MODEL_CACHE.inc(coin=coin, model=self.model_name, result="hit" if status == "ready" else "miss")
+            if status == "ready":
+                frame = pd.DataFrame(window, columns=window_columns(window.shape[1] + 1)[:-1])
+                with stage("predict", coin, self.model_name):
+                    prediction = float(np.asarray(tier.model.predict(frame), dtype=float).ravel()[-1])
+                used = "heavy"
+
+            # (re)train in the background once the heavy model is missing or behind the data
+            if self._should_train(tier, len(df)):
+                tier.training = True
+                self.pool.submit(self._train, coin, tier, df.copy())
+
+        if prediction is None:
+            with stage("predict", coin, "fallback"):
+                prediction = tier.fallback.predict()
+        return {'prediction': prediction, 'tier': used, 'status': status}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
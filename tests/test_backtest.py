@@ -0,0 +1,72 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import _run_fold, walk_forward_folds
+from dataset import prepare_data
+
+
+def _history(n_rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'Date': pd.date_range("2024-01-01", periods=n_rows, freq="min"),
+                         'Price': 100 + rng.normal(size=n_rows).cumsum()})
+
+
+@pytest.mark.parametrize("horizon", [1, 5, 30])
+@pytest.mark.parametrize("window", ["expanding", "sliding"])
+def test_no_training_target_after_first_test_input(horizon, window):
+    look_back = 5
+    df = _history(400)
+    windows = prepare_data(df, look_back, horizon)
+    dates = df['Date'].to_numpy()
+    # row i is predicted from inputs up to i + look_back - 1 and targets i + look_back + horizon - 1
+    target_dates = dates[look_back + horizon - 1:][:len(windows)]
+    last_input_dates = dates[look_back - 1:][:len(windows)]
+
+    folds = walk_forward_folds(len(windows), initial_train=100, step=20, window=window, horizon=horizon)
+    assert len(folds) > 0
+    for train_start, train_end, test_start, test_end in folds:
+        assert train_start < train_end <= test_start < test_end
+        assert target_dates[train_start:train_end].max() <= last_input_dates[test_start]
+
+
+def test_embargo_override():
+    folds = walk_forward_folds(100, initial_train=50, step=10, horizon=5, embargo=0)
+    assert (folds[:, 1] == folds[:, 2]).all()
+    folds = walk_forward_folds(100, initial_train=50, step=10, horizon=5)
+    assert (folds[:, 2] - folds[:, 1] == 4).all()
+
+
+class _RowForecaster:
+    # forecasts the index of each row following its training sample, like ARIMA/SARIMAX
+    def __init__(self, args):
+        self.train_size = 0
+
+    def fit(self, data):
+        self.train_size = len(data)
+
+    def predict(self, test_x):
+        return np.arange(self.train_size, self.train_size + len(test_x), dtype=float)
+
+
+def test_sequential_forecast_skips_embargo(monkeypatch):
+    from train_matrix import share_array
+
+    monkeypatch.setitem(sys.modules, "models", types.SimpleNamespace(MODELS={"arima": _RowForecaster}))
+    windows = np.arange(200, dtype=float).reshape(-1, 2)
+    dates = np.arange(len(windows), dtype="int64")
+    windows_shm, windows_spec = share_array(windows)
+    dates_shm, dates_spec = share_array(dates)
+    try:
+        train_start, train_end, test_start, test_end = walk_forward_folds(len(windows), 50, 10, embargo=4)[0]
+        predicted, error = _run_fold("arima", {}, (train_start, train_end, test_start, test_end),
+                                     windows_spec, dates_spec)
+    finally:
+        for shm in (windows_shm, dates_shm):
+            shm.close()
+            shm.unlink()
+    assert error is None
+    np.testing.assert_array_equal(predicted, np.arange(test_start, test_end))
@@ -0,0 +1,114 @@
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sentimental analysis"))
+from news_feed import NewsFeed, parse_items  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class _Response:
+
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class _Session:
+    # serves one document with an ETag and answers 304 to a matching If-None-Match
+
+    def __init__(self, content, etag='"v1"'):
+        self.content = content
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return _Response(304)
+        return _Response(200, self.content, {"ETag": self.etag})
+
+
+@pytest.fixture
+def feed_file(tmp_path):
+    path = tmp_path / "rss.xml"
+    shutil.copy(os.path.join(FIXTURES, "rss.xml"), path)
+    return str(path)
+
+
+def test_parse_rss():
+    items = list(parse_items(_read("rss.xml")))
+    assert [item["key"] for item in items] == ["rss-1", "rss-2", "https://example.com/news/3"]
+    assert items[0]["title"] == "Bitcoin climbs past resistance"
+    # RFC 822 dates are stored as ISO 8601 UTC
+    assert items[1]["published"] == "2024-01-03T06:30:00+00:00"
+
+
+def test_parse_atom():
+    items = list(parse_items(_read("atom.xml")))
+    assert [item["key"] for item in items] == ["urn:example:a", "urn:example:b"]
+    assert items[0]["link"] == "https://example.org/posts/a"
+    assert items[0]["published"] == "2024-01-05T09:15:00+00:00"
+    assert items[1]["published"] == "2024-01-06T17:45:00+00:00"
+
+
+def test_poll_dedups_items(tmp_path, feed_file):
+    feed = NewsFeed([feed_file], cache_path=str(tmp_path / "feeds.sqlite"))
+    feed.ack(feed.poll()["key"])
+    # the file changes, but only the added item is new
+    with open(feed_file, "rb") as f:
+        content = f.read()
+    extra = b"<item><title>New listing</title><guid>rss-4</guid></item></channel>"
+    with open(feed_file, "wb") as f:
+        f.write(content.replace(b"</channel>", extra))
+    os.utime(feed_file, (1e9, 1e9))
+    assert feed.poll()["key"].tolist() == ["rss-4"]
+    assert len(feed.items()) == 4
+    feed.close()
+
+
+def test_unchanged_feed_is_not_refetched(tmp_path):
+    session = _Session(_read("atom.xml"))
+    url = "https://example.org/feed"
+    feed = NewsFeed([url], cache_path=str(tmp_path / "feeds.sqlite"), session=session)
+    feed.ack(feed.poll()["key"])
+    assert feed.poll().empty
+    # the second request is conditional and answered with 304
+    assert session.requests[1]["If-None-Match"] == '"v1"'
+    assert len(feed.items()) == 2
+    feed.close()
+
+
+def test_unacknowledged_items_are_returned_again(tmp_path, feed_file):
+    feed = NewsFeed([feed_file], cache_path=str(tmp_path / "feeds.sqlite"))
+    first = feed.poll()
+    assert len(first) == 3
+    # e.g. scoring failed after rss-1 was stored: the other two come back on the next poll
+    feed.ack(["rss-1"])
+    assert feed.poll()["key"].tolist() == ["rss-2", "https://example.com/news/3"]
+    feed.ack(first["key"])
+    assert feed.poll().empty
+    feed.close()
+
+
+@pytest.mark.parametrize("since", ["2024-01-03 06:30", "2024-01-03 08:30+02:00",
+                                   pd.Timestamp("2024-01-03 01:30", tz="America/New_York")])
+def test_items_since(tmp_path, feed_file, since):
+    feed = NewsFeed([feed_file], cache_path=str(tmp_path / "feeds.sqlite"))
+    feed.poll()
+    assert feed.items(since)["key"].tolist() == ["rss-2", "https://example.com/news/3"]
+    feed.close()
@@ -62,8 +62,8 @@ def train_and_evaluate(model, model_name, train_data, test_data):
     # If test_data is a DataFrame, use column indexing for pandas
     test_features = test_data.iloc[:, :-1]  # Use pandas iloc for slicing
     
-    # Convert to numpy array if needed (for prediction)
-    predictions = model.predict(test_features.values)
+    # The wrappers take the frame itself (ARIMA and Orbit index it by column)
+    predictions = model.predict(test_features)
 
     actual_values = test_data.iloc[:, -1].values  # Get the target values (last column)
 
@@ -114,6 +114,13 @@ if __name__ == "__main__":
     train_data_df = pd.DataFrame(train_data, columns=[f"feature_{i}" for i in range(train_data.shape[1] - 1)] + ['Price'])
     test_data_df = pd.DataFrame(test_data, columns=[f"feature_{i}" for i in range(test_data.shape[1] - 1)] + ['Price'])
 
+    # Orbit fits its trend on real timestamps: the date of each window's target row
+    window_dates = df_orbit_prophet['Date'].to_numpy()[look_back:look_back + len(data)]
+    dated_train_df = train_data_df.copy()
+    dated_train_df.insert(0, 'Date', window_dates[:split_index])
+    dated_test_df = test_data_df.copy()
+    dated_test_df.insert(0, 'Date', window_dates[split_index:])
+
     # Define model parameters
     model_args = Namespace(
         hidden_dim=64, epochs=50, 
@@ -140,4 +147,7 @@ if __name__ == "__main__":
 
     # Train and evaluate each model
     for model_name, model in models.items():
-        train_and_evaluate(model, model_name, train_data_df, test_data_df)
+        if model_name == "Orbit":
+            train_and_evaluate(model, model_name, dated_train_df, dated_test_df)
+        else:
+            train_and_evaluate(model, model_name, train_data_df, test_data_df)
@@ -55,8 +55,8 @@ def train_and_evaluate(model, model_name, train_data, test_data):
     # If test_data is a DataFrame, use column indexing for pandas
     test_features = test_data.iloc[:, :-1]  # Use pandas iloc for slicing
     
-    # Convert to numpy array if needed (for prediction)
-    predictions = model.predict(test_features.values)
+    # The wrappers take the frame itself (Orbit reads the Date column from it)
+    predictions = model.predict(test_features)
 
     actual_values = test_data.iloc[:, -1].values  # Get the target values (last column)
 
@@ -87,44 +87,25 @@ def train_and_evaluate(model, model_name, train_data, test_data):
     results_df.to_csv(output_file, index=False)
     print(f"Predictions and evaluation metrics saved to {output_file}")
 
-def predict_future(model, train_data, look_back=5, time_intervals=[10, 180, 1440, 10080, 43200]):
-    # Prepare the last 'look_back' data for prediction (use the most recent data point)
-    last_data_point = train_data[-look_back:, :-1]  # Last 'look_back' rows excluding the target (Price)
-    predictions = {}
+def predict_future(model, train_data, time_intervals=[10, 180, 1440, 10080, 43200]):
+    # Orbit continues the training timestamps at the data's bar frequency, so each interval (in minutes)
+    # becomes a number of bars ahead; the regressors are held at their last observed values
+    try:
+        bar_minutes = pd.Timedelta(pd.tseries.frequencies.to_offset(model.freq)).total_seconds() / 60
+    except ValueError:
+        bar_minutes = 1440  # non-fixed frequencies (e.g. month starts): assume daily bars
+    steps = [max(int(np.ceil(interval / bar_minutes)), 1) for interval in time_intervals]
 
-    # Convert the last_data_point into a DataFrame to match the input format the model expects
-    columns = [f"feature_{i}" for i in range(last_data_point.shape[1])]  # Create feature column names
-    last_data_point_df = pd.DataFrame(last_data_point, columns=columns)
-    
-    # Ensure the correct columns are present and in the same order as during training
-    missing_columns = set(model.sc_in.feature_names_in_) - set(last_data_point_df.columns)
-    for missing_col in missing_columns:
-        last_data_point_df[missing_col] = 0  # Add missing columns with 0 values
-    
-    # Reorder columns to match the training data feature order
-    last_data_point_df = last_data_point_df[model.sc_in.feature_names_in_]
-
-    # Now, we iterate over the time intervals and predict the future prices
-    for interval in time_intervals:
-        future_data_point = last_data_point_df.copy()  # Start from the most recent data point
-        
-        for _ in range(interval):  # Predict for the next 'interval' time steps
-            # Ensure we're using the same feature order and applying the scaler consistently
-            future_data_point_scaled = model.sc_in.transform(future_data_point.values)  # Apply the scaler
-            future_prediction = model.predict(future_data_point_scaled)  # Predict next step
-            
-            # Convert predicted values back into a DataFrame for future predictions
-            future_data_point_df = pd.DataFrame(future_prediction, columns=["Prediction"])
-            
-            # Update the data for the next prediction step
-            future_data_point = future_data_point_df
-        
-        # Store the predicted price for the current interval
-        predictions[interval] = future_data_point_df["Prediction"].iloc[-1]
+    last_row = train_data.drop(columns=['Date', 'Price']).iloc[[-1]]
+    future = pd.concat([last_row] * max(steps), ignore_index=True)
+    path = np.asarray(model.predict(future)).ravel()
 
+    # Store the predicted price for each interval
+    predictions = {}
+    for interval, step in zip(time_intervals, steps):
+        predictions[interval] = path[step - 1]
     return predictions
 
-
 if __name__ == "__main__":
     # Load the dataset
     df_orbit_prophet = load_data(btc_data_path, include_date_for_time_series=True)  # For Orbit and Prophet
@@ -144,6 +125,11 @@ if __name__ == "__main__":
     train_data_df = pd.DataFrame(train_data, columns=[f"feature_{i}" for i in range(train_data.shape[1] - 1)] + ['Price'])
     test_data_df = pd.DataFrame(test_data, columns=[f"feature_{i}" for i in range(test_data.shape[1] - 1)] + ['Price'])
 
+    # Orbit fits its trend on real timestamps: the date of each window's target row
+    window_dates = df_orbit_prophet['Date'].to_numpy()[look_back:look_back + len(data)]
+    train_data_df.insert(0, 'Date', window_dates[:split_index])
+    test_data_df.insert(0, 'Date', window_dates[split_index:])
+
     # Define model parameters
     model_args = Namespace(
         response_col="Price", 
@@ -165,7 +151,7 @@ if __name__ == "__main__":
         train_and_evaluate(model, model_name, train_data_df, test_data_df)
 
         # Predict future BTC prices for 10 minutes, 3 hours, 1 day, 1 week, and 1 month
-        future_predictions = predict_future(model, train_data)
+        future_predictions = predict_future(model, train_data_df)
         print(f"Future Predictions for {model_name}: {future_predictions}")
 
         # Save the predictions for future prices
@@ -0,0 +1,237 @@
+"""
+Train a matrix of (coin, model, look_back, horizon) jobs across a process pool.
+
+Each coin is loaded once in the parent and its windowed arrays are placed in
+shared memory; workers attach to that memory instead of re-reading the CSVs or
+receiving pickled DataFrames. The workers start with the thread pools of TF,
+XGBoost and BLAS capped so that the pool, not the libraries, decides how many
+cores are used.
+
+Example:
+    python train_matrix.py --coins BTC ETH SOL --models lstm gru random_forest --workers 4
+"""
+import argparse
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from dataset import DATA_DIR, load_data, prepare_data, window_columns
+
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS",
+]
+
+# models whose wrappers need the Date column next to the window features
+DATE_MODELS = {"orbit", "prophet", "neural_prophet"}
+
+DEFAULT_MODEL_ARGS = dict(
+    hidden_dim=64, epochs=50,
+    order=(1, 1, 1),
+    seasonal_order=(1, 1, 1, 12),
+    enforce_invertibility=True, enforce_stationarity=True,
+    response_col="Price", date_col="Date",
+    n_estimators=100, random_state=42,
+    is_daily=True, is_hourly=False, confidence_level=0.95,
+    estimator="stan-map",
+    seasonality=12,
+    seed=42,
+    global_trend_option="linear",
+    n_bootstrap_draws=100,
+)
+
+
+def share_array(array):
+    """
+    Copy an array into a new shared memory block.
+
+    Returns:
+        tuple: (SharedMemory, spec dict a worker can attach with).
+    """
+    array = np.ascontiguousarray(array)
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, {"name": shm.name, "shape": array.shape, "dtype": array.dtype.str}
+
+
+def attach_array(spec):
+    """
+    Attach to a shared array created by `share_array` without copying it.
+
+    Returns:
+        tuple: (SharedMemory, read-only np.ndarray view).
+    """
+    shm = SharedMemory(name=spec["name"])
+    array = np.ndarray(spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=shm.buf)
+    array.flags.writeable = False
+    return shm, array
+
+
+def window_frame(windows, dates, model_name):
+    """
+    Wrap windowed rows in the DataFrame layout the model wrappers expect.
+
+    Args:
+        windows (np.ndarray): Rows from dataset.prepare_data.
+        dates (np.ndarray): Target dates as int64 nanoseconds, one per row.
+        model_name (str): Key of models.MODELS; date-based models get a Date column.
+
+    Returns:
+        pd.DataFrame: Feature columns followed by 'Price'.
+    """
+    frame = pd.DataFrame(windows, columns=window_columns(windows.shape[1]))
+    if model_name in DATE_MODELS:
+        frame.insert(0, "Date", pd.to_datetime(dates.view("datetime64[ns]")))
+    return frame
+
+
+@contextmanager
+def worker_threads(threads):
+    """
+    Cap the thread pools of TF, XGBoost and BLAS in the worker processes started inside the block.
+
+    The limits are read once when those libraries load, and a spawned worker
+    re-imports the parent's main module (and numpy with it) before it runs any
+    task, so they are set in this process's environment, which the workers
+    inherit, and restored on exit.
+
+    Args:
+        threads (int): Threads each worker may use.
+    """
+    saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _run_job(job, windows_spec, dates_spec, model_args, test_size, output_dir):
+    coin, model_name, look_back, horizon = job
+    start = time.perf_counter()
+    windows_shm, windows = attach_array(windows_spec)
+    dates_shm, dates = attach_array(dates_spec)
+    try:
+        from models import MODELS
+
+        split_index = int(len(windows) * (1 - test_size))
+        frame = window_frame(windows, dates, model_name)
+        train_df = frame.iloc[:split_index].copy()
+        test_df = frame.iloc[split_index:].copy()
+
+        args = Namespace(**dict(model_args, coin=coin))
+        model = MODELS[model_name](args)
+        model.fit(train_df)
+        predictions = model.predict(test_df.drop(columns=["Price"]))
+        predicted = np.asarray(predictions, dtype=float).ravel()
+        actual = test_df["Price"].to_numpy()
+
+        errors = actual - predicted
+        result = {
+            "coin": coin, "model": model_name, "look_back": look_back, "horizon": horizon,
+            "mae": float(np.mean(np.abs(errors))), "rmse": float(np.sqrt(np.mean(errors ** 2))),
+            "seconds": time.perf_counter() - start, "error": None,
+        }
+        output_file = os.path.join(output_dir, f"{model_name}_{coin}_lb{look_back}_h{horizon}_Predictions.csv")
+        pd.DataFrame({"Actual Price": actual, "Predicted Price": predicted}).to_csv(output_file, index=False)
+        return result
+    except Exception as e:
+        return {"coin": coin, "model": model_name, "look_back": look_back, "horizon": horizon,
+                "mae": np.nan, "rmse": np.nan, "seconds": time.perf_counter() - start, "error": repr(e)}
+    finally:
+        del windows, dates
+        windows_shm.close()
+        dates_shm.close()
+
+
+def run_matrix(coins, model_names, look_backs=(5,), horizons=(1,), workers=None, threads_per_job=1,
+               model_args_overrides=None, test_size=0.2, data_dir=DATA_DIR, output_dir="models"):
+    """
+    Train every (coin, model, look_back, horizon) combination in a process pool.
+
+    Args:
+        coins (list): Coin symbols.
+        model_names (list): Keys of models.MODELS.
+        look_backs (list): Window lengths.
+        horizons (list): Target steps ahead of the window.
+        workers (int): Number of worker processes. Defaults to cores // threads_per_job.
+        threads_per_job (int): Thread cap for TF, XGBoost and BLAS inside each job.
+        model_args_overrides (dict): Overrides for DEFAULT_MODEL_ARGS.
+        test_size (float): Fraction of windows held out for evaluation.
+
+    Returns:
+        pd.DataFrame: One row of metrics per job.
+    """
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_job)
+    model_args = dict(DEFAULT_MODEL_ARGS, n_jobs=threads_per_job)
+    model_args.update(model_args_overrides or {})
+    os.makedirs(output_dir, exist_ok=True)
+
+    shared = []
+    specs = {}
+    try:
+        # load every coin once and share each (look_back, horizon) window set
+        for coin in coins:
+            df = load_data(coin, include_date_for_time_series=True, data_dir=data_dir)
+            for look_back, horizon in itertools.product(look_backs, horizons):
+                windows = prepare_data(df, look_back, horizon)
+                dates = df['Date'].to_numpy(dtype="datetime64[ns]")[look_back + horizon - 1:]
+                dates = dates[:len(windows)].view("int64")
+                windows_shm, windows_spec = share_array(windows)
+                dates_shm, dates_spec = share_array(dates)
+                shared.extend([windows_shm, dates_shm])
+                specs[(coin, look_back, horizon)] = (windows_spec, dates_spec)
+
+        results = []
+        with worker_threads(threads_per_job), \
+                ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = []
+            for coin, model_name, look_back, horizon in itertools.product(coins, model_names, look_backs, horizons):
+                windows_spec, dates_spec = specs[(coin, look_back, horizon)]
+                futures.append(pool.submit(_run_job, (coin, model_name, look_back, horizon),
+                                           windows_spec, dates_spec, model_args, test_size, output_dir))
+            for future in as_completed(futures):
+                result = future.result()
+                status = f"failed: {result['error']}" if result["error"] else f"MAE {result['mae']:.4f}"
+                print(f"{result['model']} {result['coin']} lb={result['look_back']} "
+                      f"h={result['horizon']}: {status} ({result['seconds']:.1f}s)")
+                results.append(result)
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+
+    return pd.DataFrame(results).sort_values(["coin", "model", "look_back", "horizon"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a model x coin matrix in parallel")
+    parser.add_argument("--coins", nargs="+", default=["BTC", "ETH", "SOL"])
+    parser.add_argument("--models", nargs="+", default=["lstm", "gru", "arima", "sarimax", "random_forest", "xgboost"])
+    parser.add_argument("--look-backs", nargs="+", type=int, default=[5])
+    parser.add_argument("--horizons", nargs="+", type=int, default=[1])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-job", type=int, default=1)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output-dir", default="models")
+    cli = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = run_matrix(cli.coins, cli.models, cli.look_backs, cli.horizons, cli.workers,
+                         cli.threads_per_job, data_dir=cli.data_dir, output_dir=cli.output_dir)
+    summary.to_csv(os.path.join(cli.output_dir, "training_matrix_results.csv"), index=False)
+    print(summary.to_string(index=False))
+    print(f"Total wall time: {time.perf_counter() - start:.1f}s")